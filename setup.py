@@ -11,6 +11,13 @@ setup(
     author_email='stanislaw.skonieczny@gmail.com',
     url='https://github.com/stanislaw-skonieczny/python-modulr',
     packages=['modulr'],
+    python_requires='>=3.7',
+    classifiers=[
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+    ],
     package_dir = {'': 'src'},
     test_suite='tests',
     include_package_data=True,
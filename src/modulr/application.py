@@ -1,9 +1,41 @@
-from modulr.libs.topsort import topsort, CycleError
+import asyncio
+import collections
+import functools
+import hashlib
+import inspect
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import traceback
+import time
+from concurrent.futures import Future
+from types import MappingProxyType
 from modulr.injections import Injector, get_injections
+from modulr.interface_index import InterfaceIndex
 from modulr.scripts import ScriptsManager
+from modulr.ordering import DynamicTopologicalOrder
+from modulr.profiling import StartupProfiler, StartupReport, startup_profile_script
+from modulr.utils import import_by_path
+from modulr.validation import validate_registry
+
+
+_sentinel = object()
+
+_PLAN_FORMAT_VERSION = 2
+
+# threads stopping components of one level concurrently, see `Application.stop`
+_MAX_STOP_WORKERS = 32
+
+# shared by all factories without requirements mapping
+_EMPTY_MAPPING = MappingProxyType({})
 
 
 class ComponentContext(object):
+
+    __slots__ = ('name', 'config', 'scripts_manager')
     
     def __init__(self, name, config, scripts_manager):
         self.name = name
@@ -13,11 +45,21 @@ class ComponentContext(object):
 
 class Application(object):
 
-    def __init__(self, config, component_factory_registry):
+    def __init__(self, config, component_factory_registry, profiler=None, script_loader=None):
+        """ `profiler` - `StartupProfiler` measuring creation and init of components, 
+        its report is available by `get_startup_report` and `startup-profile` script. 
+        `script_loader` - called as `script_loader(application)` by `run_script_from_args` for script not registered yet, 
+        e.g. `Application.start` when components register scripts. """
         self._config = config
         self._component_factory_registry = component_factory_registry
         self._components = {}
+        self._plan = None
+        self._injector = None
+        self._profiler = profiler
+        self._script_loader = script_loader
         self._scripts_manager = ScriptsManager()
+        if profiler is not None:
+            self._scripts_manager.register('startup-profile', startup_profile_script(self))
         
     def get_scripts_manager(self):
         return self._scripts_manager
@@ -28,73 +70,881 @@ class Application(object):
     def _create_component_context(self, configured_component_factory):
         return ComponentContext(configured_component_factory.get_name(), configured_component_factory.get_config(), self._scripts_manager)
 
-    def start(self):
-        injector = self._create_injector()
+    def get_startup_report(self):
+        """ Returns `StartupReport` of the last start, empty one before the application is started. """
+        if self._profiler is None:
+            raise WrongConfigurationError('Startup report needs application created with a profiler. ')
+        if self._plan is None:
+            return StartupReport([], [], 0.0)
+        return self._profiler.get_report(self._plan)
+
+    def _measure(self, phase, name, function, *args):
+        if self._profiler is None:
+            return function(*args)
+        return self._profiler.measure(phase, name, function, *args)
+
+    async def _await_measured(self, phase, name, result):
+        if not inspect.isawaitable(result):
+            return result
+        if self._profiler is None:
+            return await result
+        return await self._profiler.measure_async(phase, name, result)
+
+    def _create_component(self, injector, plan, name):
+        if plan.is_lazy(name):
+            return name, LazyComponent(functools.partial(self._load_lazy_component, injector, plan, name))
+        return name, self._measure(StartupProfiler.CREATE, name, self._build_component, injector, plan, name)
+
+    def _build_component(self, injector, plan, name):
+        configured_component_factory = plan.get_factory(name)
+        context = self._create_component_context(configured_component_factory)
+        child_injector = injector.child(context=context)
+        return configured_component_factory.create(self._component_factory_registry, child_injector, self._components, plan.get_injections(name))
+
+    def _load_lazy_component(self, injector, plan, name):
+        component = self._measure(StartupProfiler.CREATE, name, self._build_component, injector, plan, name)
+        if inspect.isawaitable(component):
+            raise WrongConfigurationError('Lazy component {} cannot be created by a coroutine function. '.format(name))
+        self._measure(StartupProfiler.INIT, name, component.init)
+        return component
+
+    def _get_injector(self):
+        if self._injector is None:
+            self._injector = self._create_injector()
+        return self._injector
+
+    def _get_plan(self, plan):
+        if plan is None:
+            plan = self._component_factory_registry.compile()
+        self._plan = plan
+        return plan
+
+    def start(self, executor=None, plan=None, targets=None):
+        """ Creates and inits all components, or only providers of `targets` interfaces and components they depend on.
+
+        `plan` is a `StartupPlan` compiled from the registry, by default `ComponentFactoryRegistry.compile()` is used.
+
+        If `executor` (e.g. `concurrent.futures.ThreadPoolExecutor`) is given, components are created level by level:
+        all components of one dependency level are created concurrently on the executor, after the previous level is done.
+        Then `init()` is called level by level in reversed order, concurrently within a level. 
+        All `init()` failures of a level are collected and raised together as `InitializationError`.
+
+        Lazy components are not created here, `LazyComponent` proxies are injected instead.
+        Components already created (e.g. by `start_shared` or `start` with `targets`) are not created again.
+        """
+        plan = self._get_plan(plan)
+        names = plan.get_order() if targets is None else self._get_closure(plan, targets)
+        self._start_components(plan, [name for name in names if name not in self._components], executor)
+
+    def run_script_from_args(self, parameters, executor=None):
+        """ Runs script like `ScriptsManager.run_script_from_args`, starting only components the script needs.
+
+        Providers of interfaces required by the script (see `ScriptsManager.register`) and their dependencies are started
+        and passed to the handler: `handler(args, **components)`, components are keyed by interface. 
+        Script not registered yet is looked up again after `script_loader` (see `__init__`) is called, 
+        without `script_loader` `ValueError` is raised and nothing is started.
+        """
+        script_name = parameters[0]
+        args = parameters[1:]
+        try:
+            info = self._scripts_manager.get_script_info(script_name)
+        except ValueError:
+            if self._script_loader is None:
+                raise
+            self._script_loader(self)
+            info = self._scripts_manager.get_script_info(script_name)
+        plan = self._get_plan(self._plan)
+        providers = {}
+        for interface in info.requires:
+            names = self._get_providers(plan, interface)
+            if len(names) > 1:
+                raise WrongConfigurationError('Script {} requires {}, but too many components implements it: {}. '.format(script_name, interface, ', '.join(names)))
+            providers[interface] = names
+        self.start(executor, plan, info.requires)
+        components = dict((interface, self._components[names[0]]) for interface, names in providers.items())
+        return self._scripts_manager.run_script(script_name, args, **components)
+
+    def _get_providers(self, plan, interface):
+        return [name for name in self._component_factory_registry.get_by_implements(interface) if name in plan]
+
+    def _get_closure(self, plan, interfaces):
+        """ Returns names of all providers of `interfaces` and of components they transitively depend on, in start order. """
+        names = []
+        for interface in interfaces:
+            providers = self._get_providers(plan, interface)
+            if not providers:
+                raise WrongConfigurationError('No component implements {}. '.format(interface))
+            names.extend(providers)
+        return plan.get_required(names)
+
+    def start_shared(self, executor=None, plan=None):
+        """ Creates and inits only fork-safe components, see `start_prefork`. """
+        plan = self._get_plan(plan)
+        self._start_components(plan, [name for name in plan.get_order() if plan.is_fork_safe(name) and name not in self._components], executor)
+
+    def start_prefork(self, workers, worker_main, executor=None, plan=None):
+        """ Creates fork-safe components once, then forks `workers` processes and returns their pids.
+
+        Every worker creates remaining (fork-unsafe) components in dependency order (serially, `executor` is used only in parent), 
+        calls `worker_main(application)` and exits with status 0, or 1 if exception was raised. 
+        Shared components are inherited by workers as copy-on-write memory. 
+        """
+        self.start_shared(executor, plan)
+        pids = []
+        for i in range(workers):
+            pid = os.fork()
+            if pid == 0:
+                status = 1
+                try:
+                    self.start(plan=self._plan)
+                    worker_main(self)
+                    status = 0
+                except BaseException:
+                    traceback.print_exc()
+                finally:
+                    # `os._exit` does not flush buffers of the worker
+                    logging.shutdown()
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    os._exit(status)
+            pids.append(pid)
+        return pids
+
+    def _start_components(self, plan, names, executor):
+        injector = self._get_injector()
+        if executor is None:
+            components = []
+            for name in names:
+                name, component = self._create_component(injector, plan, name)
+                self._components[name] = component
+                components.append((name, component))
+            for name, component in reversed(components):
+                if not isinstance(component, LazyComponent):
+                    self._measure(StartupProfiler.INIT, name, component.init)
+        else:
+            names = set(names)
+            levels = []
+            for level in plan.get_levels():
+                futures = [executor.submit(self._create_component, injector, plan, name) for name in level if name in names]
+                created = [future.result() for future in futures]
+                for name, component in created:
+                    self._components[name] = component
+                levels.append(created)
+            for level in reversed(levels):
+                self._init_level(executor, level)
+
+    def _init_level(self, executor, level):
+        futures = [(name, executor.submit(self._measure, StartupProfiler.INIT, name, component.init)) for name, component in level if not isinstance(component, LazyComponent)]
+        errors = {}
+        for name, future in futures:
+            exception = future.exception()
+            if exception is not None:
+                errors[name] = exception
+        if errors:
+            raise InitializationError(errors)
+
+    async def start_async(self, plan=None):
+        """ Creates and inits all components on the running event loop.
+
+        Factories may be coroutine functions and `init()` may be a coroutine method. 
+        Components of one dependency level are awaited concurrently with `asyncio.gather`, 
+        `init()` is called level by level in reversed order like in `start`.
+        Components already created (e.g. by `start_shared` or `start` with `targets`) are not created again.
+        """
+        plan = self._get_plan(plan)
+        injector = self._get_injector()
+        levels = []
+        for level in plan.get_levels():
+            created = await asyncio.gather(*[self._create_component_async(injector, plan, name) for name in level if name not in self._components])
+            for name, component in created:
+                self._components[name] = component
+            levels.append(created)
+        for level in reversed(levels):
+            await self._init_level_async(level)
+
+    async def _create_component_async(self, injector, plan, name):
+        name, component = self._create_component(injector, plan, name)
+        if not isinstance(component, LazyComponent):
+            component = await self._await_measured(StartupProfiler.CREATE, name, component)
+        return name, component
+
+    async def _init_component_async(self, name, component):
+        return await self._await_measured(StartupProfiler.INIT, name, self._measure(StartupProfiler.INIT, name, component.init))
+
+    async def _init_level_async(self, level):
+        level = [(name, component) for name, component in level if not isinstance(component, LazyComponent)]
+        results = await asyncio.gather(*[self._init_component_async(name, component) for name, component in level], return_exceptions=True)
+        errors = {}
+        for (name, component), result in zip(level, results):
+            # cancellation is not a failure of the component, it must stop the whole start
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, BaseException):
+                errors[name] = result
+        if errors:
+            raise InitializationError(errors)
+
+    def reconfigure(self, component_factory_registry, plan=None):
+        """ Switches running application to new registry, rebuilding only what changed.
+
+        Components which are new, removed, or differ by factory, config, laziness or chosen requirements are changed. 
+        Changed components and all components transitively depending on them are stopped (in reversed order) and dropped,
+        then created again in dependency order, 
+        then inited in reversed order. All other component instances are kept. 
+        After partial start new components are not created and not started components are not rebuilt,
+        dependencies of rebuilt components are created when missing. 
+        Returns names of created components in creation order.
+
+        There is no rollback: stopped components are not restored when rebuilding fails. 
+        If creating a component raises, components created by this call are dropped (they were not inited yet) and the error is raised,
+        `start()` creates the missing components again. Failure of `init()` leaves created components in place.
+        """
+        if self._plan is None:
+            self._component_factory_registry = component_factory_registry
+            self.start(plan=plan)
+            return list(self._plan.get_order())
+        old_plan = self._plan
+        if plan is None:
+            plan = component_factory_registry.compile()
+        old_names = set(old_plan.get_order())
+        started = set(self._components)
+        started_all = started >= old_names
+        dependants = {}
+        affected = set()
+        for name in plan.get_order():
+            for required_component in plan.get_injections(name).values():
+                dependants.setdefault(required_component, []).append(name)
+            if name not in old_names or _is_changed(old_plan, plan, name):
+                affected.add(name)
+        stack = list(affected)
+        while stack:
+            for dependant in dependants.get(stack.pop(), ()):
+                if dependant not in affected:
+                    affected.add(dependant)
+                    stack.append(dependant)
+        dropped = [name for name in reversed(old_plan.get_order()) if name in started and (name in affected or name not in plan)]
+        for name in dropped:
+            stop = _get_stop(self._components.pop(name))
+            if stop is not None:
+                stop()
+        self._component_factory_registry = component_factory_registry
+        self._plan = plan
+        injector = self._get_injector()
+        # after partial start (`start_shared`, `start` with `targets`) only started components are rebuilt, 
+        # together with their dependencies which are not started yet
+        rebuilt = plan.get_required(affected if started_all else affected & started)
         components = []
-        for configured_component_factory in self._component_factory_registry.iterate_in_order():
-            name = configured_component_factory.get_name()
-            context = self._create_component_context(configured_component_factory)
-            child_injector = injector.child(context=context)
-            component = configured_component_factory.create(self._component_factory_registry, child_injector, self._components)
-            self._components[name] = component
-            components.append((name, component))
+        try:
+            for name in rebuilt:
+                if name not in self._components:
+                    name, component = self._create_component(injector, plan, name)
+                    self._components[name] = component
+                    components.append((name, component))
+        except BaseException:
+            for name, component in components:
+                del self._components[name]
+            raise
         for name, component in reversed(components):
-            # TODO: test it!
-            component.init()
+            if not isinstance(component, LazyComponent):
+                self._measure(StartupProfiler.INIT, name, component.init)
+        return [name for name, component in components]
+
+    def stop(self, timeout=None, component_timeout=None, executor=None):
+        """ Stops components in reversed dependency order and forgets them. Returns `ShutdownReport`.
+
+        Components of one dependency level are stopped concurrently on `executor` 
+        (by default on up to `_MAX_STOP_WORKERS` daemon threads), the next level starts when the previous one is done. 
+        `component_timeout` limits each `stop()` call counted from its own start, `timeout` limits whole shutdown. 
+        Calls which exceed their budget are left running in the background and reported as timed out 
+        (a new default thread takes over remaining calls of the level), 
+        components whose `stop()` was not started before `timeout` passed are reported as skipped.
+        Coroutine `stop()` methods are run to completion by `asyncio.run` on the stopping thread.
+        Hung calls left on the default daemon threads do not delay process exit, 
+        but threads of a given `executor` may keep the process alive until the calls return.
+        Components without `stop` method and never loaded lazy components are not stopped.
+        """
+        report = ShutdownReport()
+        if self._plan is None:
+            return report
+        levels = []
+        for level in reversed(self._plan.get_levels()):
+            stoppable = []
+            for name in level:
+                stop = _get_stop(self._components.get(name))
+                if stop is not None:
+                    stoppable.append(_StopCall(name, stop))
+            if stoppable:
+                levels.append(stoppable)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for level in levels:
+            if deadline is not None and time.monotonic() >= deadline:
+                report.skipped.extend(call.name for call in level)
+                continue
+            _stop_level(level, component_timeout, deadline, executor, report)
+        self._components = {}
+        self._plan = None
+        self._injector = None
+        return report
+
+
+class _StopCall(object):
+    """ `stop()` of one component, `started` is set (under the level condition) when the call begins. """
+
+    __slots__ = ('name', 'stop', 'future', 'started')
+
+    def __init__(self, name, stop):
+        self.name = name
+        self.stop = stop
+        self.future = Future()
+        self.started = None
+
+
+def _stop_level(calls, component_timeout, deadline, executor, report):
+    condition = threading.Condition()
+    work = collections.deque(calls)
+    if executor is None:
+        for i in range(min(_MAX_STOP_WORKERS, len(calls))):
+            _start_stop_thread(work, condition)
+    else:
+        for call in calls:
+            executor.submit(_run_stop_call, call, condition)
+    pending = list(calls)
+    with condition:
+        while pending:
+            now = time.monotonic()
+            wait_timeout = None if deadline is None else deadline - now
+            waiting = []
+            for call in pending:
+                if call.future.done():
+                    if call.future.exception() is not None:
+                        report.failed[call.name] = call.future.exception()
+                    else:
+                        report.stopped.append(call.name)
+                elif deadline is not None and now >= deadline:
+                    if call.future.cancel():
+                        report.skipped.append(call.name)
+                    else:
+                        report.timed_out.append(call.name)
+                elif call.started is not None and component_timeout is not None and now >= call.started + component_timeout:
+                    report.timed_out.append(call.name)
+                    if executor is None and work:
+                        # the hung call keeps its thread, remaining calls get a new one
+                        _start_stop_thread(work, condition)
+                else:
+                    waiting.append(call)
+                    if call.started is not None and component_timeout is not None:
+                        remaining = call.started + component_timeout - now
+                        wait_timeout = remaining if wait_timeout is None else min(wait_timeout, remaining)
+            pending = waiting
+            if pending:
+                condition.wait(wait_timeout)
+
+
+def _start_stop_thread(work, condition):
+    """ Daemon thread running calls from `work`. Unlike threads of `ThreadPoolExecutor`, daemon threads are not waited for at interpreter exit. """
+    def worker():
+        while True:
+            try:
+                call = work.popleft()
+            except IndexError:
+                return
+            _run_stop_call(call, condition)
+    thread = threading.Thread(target=worker, name='modulr-stop')
+    thread.daemon = True
+    thread.start()
+
+
+def _run_stop_call(call, condition):
+    if not call.future.set_running_or_notify_cancel():
+        return
+    with condition:
+        call.started = time.monotonic()
+        condition.notify_all()
+    try:
+        result = call.stop()
+        if inspect.isawaitable(result):
+            result = asyncio.run(_await(result))
+    except BaseException as e:
+        call.future.set_exception(e)
+    else:
+        call.future.set_result(result)
+    with condition:
+        condition.notify_all()
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
+def _get_stop(component):
+    if component is None or (isinstance(component, LazyComponent) and not component.is_loaded()):
+        return None
+    return getattr(component, 'stop', None)
+
+
+def _is_changed(old_plan, plan, name):
+    old_factory = old_plan.get_factory(name)
+    factory = plan.get_factory(name)
+    return (old_factory.get_component_factory() != factory.get_component_factory()
+        or old_factory.get_config() != factory.get_config()
+        or old_plan.is_lazy(name) != plan.is_lazy(name)
+        or dict(old_plan.get_injections(name)) != dict(plan.get_injections(name)))
 
 
 class Component(object):
     
     def init(self):
+        """ Called after all components are created. May be overridden with a coroutine method when used with `Application.start_async`. """
         pass
 
+    def stop(self):
+        """ Called by `Application.stop` after all components depending on this one are stopped. """
+        pass
+
+
+class LazyComponent(object):
+    """ Proxy injected in place of a lazy component. The component is created and inited on first attribute access. 
+
+    Calling, iteration, containers protocol, context manager protocol, conversions to bool/str, comparisons and `isinstance` 
+    are forwarded to the component (and load it). Other special methods (e.g. arithmetic operators) are not,
+    `type()` and identity of the proxy differ from the component. 
+    """
+
+    __slots__ = ('_lazy_loader', '_lazy_lock', '_lazy_component')
+
+    def __init__(self, loader):
+        self._lazy_loader = loader
+        self._lazy_lock = threading.Lock()
+        self._lazy_component = _sentinel
+
+    def _get_lazy_component(self):
+        component = self._lazy_component
+        if component is _sentinel:
+            with self._lazy_lock:
+                if self._lazy_component is _sentinel:
+                    self._lazy_component = self._lazy_loader()
+                    self._lazy_loader = None
+                component = self._lazy_component
+        return component
+
+    def is_loaded(self):
+        return self._lazy_component is not _sentinel
+
+    def __getattr__(self, name):
+        return getattr(self._get_lazy_component(), name)
+
+    @property
+    def __class__(self):
+        # makes `isinstance` check the component
+        return type(self._get_lazy_component())
+
+    def __call__(self, *args, **kwargs):
+        return self._get_lazy_component()(*args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._get_lazy_component())
+
+    def __len__(self):
+        return len(self._get_lazy_component())
+
+    def __contains__(self, item):
+        return item in self._get_lazy_component()
+
+    def __getitem__(self, key):
+        return self._get_lazy_component()[key]
+
+    def __setitem__(self, key, value):
+        self._get_lazy_component()[key] = value
+
+    def __delitem__(self, key):
+        del self._get_lazy_component()[key]
+
+    def __enter__(self):
+        return self._get_lazy_component().__enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._get_lazy_component().__exit__(exc_type, exc_value, traceback)
+
+    def __bool__(self):
+        return bool(self._get_lazy_component())
+
+    def __str__(self):
+        return str(self._get_lazy_component())
+
+    def __eq__(self, other):
+        return self._get_lazy_component() == other
+
+    def __ne__(self, other):
+        return self._get_lazy_component() != other
+
+    def __hash__(self):
+        return hash(self._get_lazy_component())
+
 
 class ComponentFactoryRegistry(object):
     
-    def __init__(self):
+    def __init__(self, lazy=False):
         # name => configured factory
         self._factories = {} 
-        # interface that implements => name list
-        self._factories_by_implements = {}
+        # interface that implements => names
+        self._factories_by_implements = InterfaceIndex()
+        # interface that requires => name set
+        self._factories_by_requires = {}
+        # default for factories that do not choose by themselves
+        self._lazy = lazy
+        # compiled StartupPlan, reset on every change
+        self._plan = None
+        # dependency order, built by the first compile and updated incrementally afterwards
+        self._order = None
+        # name => resolved injections
+        self._injections = {}
+        # name => WrongConfigurationError raised while resolving injections
+        self._errors = {}
+        # names of lazy and fork-safe components, dicts used as ordered sets
+        self._lazy_names = {}
+        self._fork_safe_names = {}
         
     def load_from_config(self, dict_of_dicts):
-        """ dict_of_dicts is: component_name => conponent_config """
-        raise NotImplementedError()
+        """ dict_of_dicts is: component_name => conponent_config, where conponent_config is a dict with keys:
+
+        - `factory` - "package.module:function" path of component function,
+        - `implements` - list of interfaces,
+        - `requires` - list of required interfaces (optional, but without it factory module is imported now to inspect it),
+        - `config`, `requirements_mapping`, `lazy`, `fork_safe` (optional) - passed to `ConfiguredComponentFactory`.
+
+        Factory modules are imported when components are created, compile plans with `compile(cache)` to avoid resolving them again. 
+        """
+        for name, component_config in dict_of_dicts.items():
+            component_factory = ImportedComponentFactory(component_config['factory'], component_config['implements'], component_config.get('requires'))
+            self.register(ConfiguredComponentFactory(
+                name, 
+                component_factory, 
+                component_config.get('config'), 
+                component_config.get('requirements_mapping'), 
+                lazy=component_config.get('lazy'), 
+                fork_safe=component_config.get('fork_safe', False),
+            ))
 
     def register(self, configured_factory):
-        self._factories[configured_factory.get_name()] = configured_factory
+        """ Registers factory, replacing one registered with the same name. """
+        name = configured_factory.get_name()
+        if name in self._factories:
+            self.unregister(name)
+        self._plan = None
+        self._factories[name] = configured_factory
+        constraints = configured_factory.get_constraints()
+        for interface in constraints.get_implements():
+            self._factories_by_implements.add(interface, name)
+        for interface in constraints.get_requires():
+            self._factories_by_requires.setdefault(interface, set()).add(name)
+        if self.is_lazy(name):
+            self._lazy_names[name] = None
+        if self.is_fork_safe(name):
+            self._fork_safe_names[name] = None
+        if self._order is not None:
+            self._order.add_node(name)
+            self._update_injections(self._get_consumers(configured_factory) | set([name]))
+
+    def unregister(self, name):
+        configured_factory = self._factories.pop(name)
+        self._plan = None
+        constraints = configured_factory.get_constraints()
+        for interface in constraints.get_implements():
+            self._factories_by_implements.remove(interface, name)
+        for interface in constraints.get_requires():
+            names = self._factories_by_requires[interface]
+            names.discard(name)
+            if not names:
+                del self._factories_by_requires[interface]
+        self._lazy_names.pop(name, None)
+        self._fork_safe_names.pop(name, None)
+        if self._order is not None:
+            self._order.remove_node(name)
+            self._injections.pop(name, None)
+            self._errors.pop(name, None)
+            self._update_injections(self._get_consumers(configured_factory))
+
+    def _get_consumers(self, configured_factory):
+        """ Names of factories whose requirements may be resolved differently when `configured_factory` is (un)registered. """
+        consumers = set()
         for interface in configured_factory.get_constraints().get_implements():
-            self._factories_by_implements.setdefault(interface, []).append(configured_factory.get_name())
-        
+            consumers.update(self._factories_by_requires.get(interface, ()))
+        return consumers
+
+    def _update_injections(self, names):
+        added = []
+        for name in names:
+            try:
+                injections = self._factories[name].get_injections(self)
+                self._errors.pop(name, None)
+            except WrongConfigurationError as e:
+                injections = {}
+                self._errors[name] = e
+            old_providers = set(self._injections.get(name, {}).values())
+            new_providers = set(injections.values())
+            for provider in old_providers - new_providers:
+                if provider in self._order:
+                    self._order.remove_edge(provider, name)
+            added.extend((provider, name) for provider in new_providers - old_providers)
+            self._injections[name] = injections
+        # removals first, so they may unblock added edges
+        for provider, name in added:
+            self._order.add_edge(provider, name)
+
+    def _build_order(self):
+        self._order = DynamicTopologicalOrder()
+        self._injections = {}
+        self._errors = {}
+        for name in self._factories:
+            self._order.add_node(name)
+        self._update_injections(list(self._factories))
+
     def get_by_name(self, name):
         return self._factories[name]
 
+    def is_lazy(self, name):
+        lazy = self._factories[name].is_lazy()
+        return self._lazy if lazy is None else lazy
+
+    def is_fork_safe(self, name):
+        return self._factories[name].is_fork_safe()
+
+    def get_names(self):
+        """ Returns names in registration order. """
+        return list(self._factories)
+
     def get_by_implements(self, interface):
-        return self._factories_by_implements.get(interface, [])
+        return self._factories_by_implements.get_providers(interface)
+
+    def get_unique_by_implements(self, interface):
+        """ Returns name of the only component implementing `interface`, or None. """
+        return self._factories_by_implements.get_unique_provider(interface)
+
+    def implements(self, name, interface):
+        return self._factories_by_implements.has_provider(interface, name)
+
+    def validate(self):
+        """ Checks whole configuration without creating components, returns `modulr.validation.ValidationResult` listing every problem. """
+        return validate_registry(self)
+
+    def resolve(self, name, require, chosen_candidate=None):
+        """ Returns name of component providing `require` to component `name`: 
+        `chosen_candidate` if given and valid, otherwise the only implementation of `require`. """
+        if not chosen_candidate:
+            required_component = self.get_unique_by_implements(require)
+            if required_component is None:
+                candidates = self.get_by_implements(require)
+                if len(candidates) <= 0:
+                    raise WrongConfigurationError('Component {} requires {}, but no component implements it. '.format(name, require))
+                else:
+                    raise WrongConfigurationError('Component {} requires {}, but too many components implements it: {}. Choose one. '.format(name, require, ', '.join(candidates)))
+            return required_component
+        if self.implements(chosen_candidate, require):
+            return chosen_candidate
+        raise WrongConfigurationError('Component {} requires {}, but choosen components {} does not implement it. '.format(name, require, chosen_candidate))
+
+    def compile(self, cache=None):
+        """ Resolves requirements and orders components. Returns immutable `StartupPlan`, cached until next `register`/`unregister`.
+
+        Resolved requirements and dependency levels are built once and then kept up to date by `register` and `unregister`:
+        a change resolves and reorders only components it affects, the graph is not sorted again.
+        Compiling after a change only copies the kept state into new plan.
+
+        `cache` (e.g. `modulr.plan_cache.StartupPlanCache`) persists resolved plans by `get_fingerprint()`, 
+        so unchanged configuration is not resolved nor sorted again. 
+        """
+        if self._plan is None:
+            if cache is None:
+                self._plan = self._compile()
+            else:
+                fingerprint = self.get_fingerprint()
+                data = cache.load(fingerprint)
+                plan = None
+                if data is not None:
+                    try:
+                        plan = StartupPlan.from_data(self._factories, data)
+                    except ValueError:
+                        # corrupted entry is resolved again and overwritten
+                        plan = None
+                if plan is None:
+                    plan = self._compile()
+                    cache.store(fingerprint, plan.to_data())
+                self._plan = plan
+        return self._plan
+
+    def _compile(self):
+        if self._order is None:
+            self._build_order()
+        if self._errors:
+            for name in self._factories:
+                if name in self._errors:
+                    raise WrongConfigurationError(*self._errors[name].args)
+        if self._order.get_blocked_edges():
+            raise WrongConfigurationError('Cycled dependencies. ')
+        for name in self._fork_safe_names:
+            for required_component in self._injections[name].values():
+                if required_component not in self._fork_safe_names:
+                    raise WrongConfigurationError('Component {} is fork-safe, but depends on {} which is not. '.format(name, required_component))
+        return StartupPlan(self._factories, self._injections, self._order.get_levels(), self._lazy_names, self._fork_safe_names)
+
+    def get_fingerprint(self):
+        """ Hash of everything that affects the plan: names, implements, requires, requirements mappings, laziness and fork-safety. """
+        description = []
+        for name in sorted(self._factories):
+            configured_factory = self._factories[name]
+            constraints = configured_factory.get_constraints()
+            description.append([
+                name, 
+                sorted(constraints.get_implements()), 
+                sorted(constraints.get_requires()), 
+                sorted(configured_factory.get_requirements_mapping().items()), 
+                self.is_lazy(name),
+                self.is_fork_safe(name),
+            ])
+        return hashlib.sha1(json.dumps([_PLAN_FORMAT_VERSION, description]).encode('utf-8')).hexdigest()
+
+    def iterate_in_order(self):
+        return self.compile().iterate_in_order()
+
+    def iterate_levels(self):
+        """ Yields lists of configured factories. Factories in one list depend only on factories from previous lists. """
+        return self.compile().iterate_levels()
+
+
+class StartupPlan(object):
+    """ Immutable result of `ComponentFactoryRegistry.compile`: component order, chosen provider for every requirement and dependency levels. 
+    Injections of components (`name => interface => name` dicts) are not copied, they must not be changed after the plan is created. """
+
+    def __init__(self, factories, injections, levels, lazy, fork_safe=()):
+        self._factories = MappingProxyType(dict(factories))
+        self._injections = dict(injections)
+        self._levels = tuple(tuple(level) for level in levels)
+        self._order = tuple(itertools.chain.from_iterable(self._levels))
+        self._lazy = frozenset(lazy)
+        self._fork_safe = frozenset(fork_safe)
+
+    @classmethod
+    def from_data(cls, factories, data):
+        """ Raises ValueError when `data` (see `to_data`) does not describe a plan of `factories`. """
+        try:
+            plan = cls(factories, data['injections'], data['levels'], data['lazy'], data['fork_safe'])
+            names = plan._factories
+            valid = (len(plan._order) == len(names) and set(plan._order) == set(names) 
+                and set(plan._injections) == set(names)
+                and all(isinstance(injection, dict) and all(name in names for name in injection.values()) for injection in plan._injections.values())
+                and plan._lazy <= set(names) and plan._fork_safe <= set(names))
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError('Invalid plan data: {!r}'.format(e))
+        if not valid:
+            raise ValueError('Invalid plan data: it does not match components')
+        return plan
+
+    def to_data(self):
+        """ Returns plain (JSON serializable) data, see `from_data`. """
+        return {
+            'injections': dict((name, dict(injection)) for name, injection in self._injections.items()),
+            'levels': [list(level) for level in self._levels],
+            'lazy': sorted(self._lazy),
+            'fork_safe': sorted(self._fork_safe),
+        }
+
+    def get_order(self):
+        return self._order
+
+    def get_levels(self):
+        return self._levels
+
+    def get_factory(self, name):
+        return self._factories[name]
+
+    def __contains__(self, name):
+        return name in self._factories
+
+    def get_injections(self, name):
+        """ Returns interface => name of chosen component. """
+        return MappingProxyType(self._injections[name])
+
+    def is_lazy(self, name):
+        return name in self._lazy
+
+    def is_fork_safe(self, name):
+        return name in self._fork_safe
+
+    def get_required(self, names):
+        """ Returns `names` and names of components they transitively depend on, in start order. """
+        stack = list(names)
+        closure = set(stack)
+        while stack:
+            for required_component in self._injections[stack.pop()].values():
+                if required_component not in closure:
+                    closure.add(required_component)
+                    stack.append(required_component)
+        return [name for name in self._order if name in closure]
 
     def iterate_in_order(self):
-        dependencies = {}
-        for name, configured_factory in self._factories.items():
-            dependencies[name] = configured_factory.get_injections(self).values()
-        for name in sort_dependencies(dependencies):
+        for name in self._order:
             yield self._factories[name]
 
+    def iterate_levels(self):
+        for level in self._levels:
+            yield [self._factories[name] for name in level]
+
 
 class ComponentFactory(object):
+    """ Factories are equal when they are of the same type and have equal function and constraints, 
+    so registries built again from the same configuration compare equal (see `Application.reconfigure`).
+    Subclasses with more state should extend `_get_key`. """
     
     def __init__(self, fun, constraints):
         self._fun = fun
         self._constraints = constraints
+
+    def _get_key(self):
+        return (self._fun, self._constraints)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self._get_key() == other._get_key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._get_key())
     
     def create(self, injector):
-        return injector.call(self._fun)
+        return injector.call(self.get_function())
+
+    def get_function(self):
+        return self._fun
     
     def get_constraints(self, config):
         """ Notice: `config` param is not used, but passing it allows you to implement different ComponentFactory that uses confing to calculate constraints """
         return self._constraints
 
 
+class ImportedComponentFactory(ComponentFactory):
+    """ Factory of component function given by "package.module:function" path, imported on first use. 
+    When `requires` is None, they are taken from function arguments like in `simple_component_factory`. """
+
+    def __init__(self, path, implements, requires=None):
+        self._path = path
+        self._fun = None
+        if requires is None:
+            requires = get_requires_from_injections(self.get_function())
+        super(ImportedComponentFactory, self).__init__(self._fun, Constraints(implements, requires))
+
+    def get_function(self):
+        if self._fun is None:
+            self._fun = import_by_path(self._path)
+        return self._fun
+
+    def _get_key(self):
+        return (self._path, self._constraints)
+
+
 class Constraints(object):
+
+    __slots__ = ('_implements', '_requires')
     
     def __init__(self, implements, requires):
         self._implements = implements
@@ -106,64 +956,67 @@ class Constraints(object):
     def get_requires(self):
         return self._requires
 
+    def _get_key(self):
+        return (frozenset(self._implements), frozenset(self._requires))
+
+    def __eq__(self, other):
+        return isinstance(other, Constraints) and self._get_key() == other._get_key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._get_key())
+
 
 class ConfiguredComponentFactory(object):
+
+    __slots__ = ('_name', '_component_factory', '_config', '_requirements_mapping', '_lazy', '_fork_safe', '_constraints')
     
-    def __init__(self, name, component_factory, config, requirements_mapping=None):
+    def __init__(self, name, component_factory, config, requirements_mapping=None, lazy=None, fork_safe=False):
+        """ `lazy` - True/False, or None to use default of the registry. 
+        `fork_safe` - component may be created before fork and shared by worker processes, see `Application.start_prefork`. 
+        Fork-safe components may depend only on fork-safe components. """
         self._name = name
         self._component_factory = component_factory
         self._config = config
-        self._requirements_mapping = {} if requirements_mapping is None else requirements_mapping
+        self._requirements_mapping = _EMPTY_MAPPING if not requirements_mapping else requirements_mapping
+        self._lazy = lazy
+        self._fork_safe = fork_safe
         self._constraints = self._component_factory.get_constraints(self._config)
 
     def get_name(self):
         return self._name
+
+    def get_component_factory(self):
+        return self._component_factory
     
     def get_config(self):
         return self._config
 
+    def is_lazy(self):
+        return self._lazy
+
+    def is_fork_safe(self):
+        return self._fork_safe
+
+    def get_requirements_mapping(self):
+        return self._requirements_mapping
+
     def get_constraints(self):
         return self._constraints
     
     def get_injections(self, component_factory_registry):
         ret = {}
         for require in self._constraints.get_requires():
-            candidates = component_factory_registry.get_by_implements(require)
-            chosen_candidate = self._requirements_mapping.get(require)
-            if not chosen_candidate:
-                if len(candidates) == 1:
-                    required_component = candidates[0]
-                else:
-                    if len(candidates) <= 0:
-                        raise WrongConfigurationError('Component {} requires {}, but no component implements it. '.format(self._name, require))
-                    else:
-                        raise WrongConfigurationError('Component {} requires {}, but too many components implements it: {}. Choose one. '.format(self._name, require, ', '.join(candidates)))
-            else:
-                if chosen_candidate in candidates:
-                    required_component = chosen_candidate
-                else:
-                    raise WrongConfigurationError('Component {} requires {}, but choosen components {} does not implement it. '.format(self._name, require, chosen_candidate))                 
-            ret[require] = required_component
+            ret[require] = component_factory_registry.resolve(self._name, require, self._requirements_mapping.get(require))
         return ret
 
-    def create(self, crf, injector, components_mapping):
-        requires = self._constraints.get_requires()
-        for require in requires:
-            candidates = crf.get_by_implements(require)
-            chosen_candidate = self._requirements_mapping.get(require)
-            if not chosen_candidate:
-                if len(candidates) == 1:
-                    required_component = candidates[0]
-                else:
-                    if len(candidates) <= 0:
-                        raise WrongConfigurationError('Component {} requires {}, but no component implements it. '.format(self._name, require))
-                    else:
-                        raise WrongConfigurationError('Component {} requires {}, but too many components implements it: {}. Choose one. '.format(self._name, require, ', '.join(candidates)))
-            else:
-                if chosen_candidate in candidates:
-                    required_component = chosen_candidate
-                else:
-                    raise WrongConfigurationError('Component {} requires {}, but choosen components {} does not implement it. '.format(self._name, require, chosen_candidate))                 
+    def create(self, crf, injector, components_mapping, injections=None):
+        """ `injections` - already resolved `get_injections` result, resolved from `crf` when not given. """
+        if injections is None:
+            injections = self.get_injections(crf)
+        for require, required_component in injections.items():
             injector.register(require, components_mapping[required_component])
         return self._component_factory.create(injector)
 
@@ -179,25 +1032,30 @@ def simple_component_factory(component_function, implements):
     return ComponentFactory(component_function, constraints)
 
 
-def sort_dependencies(dependencies):
-    pair_list = []
-    with_dependencies = set()
-    for name, dependants in dependencies.items():
-        for dependant in dependants:
-            if not dependant in dependencies:
-                raise WrongConfigurationError('No such component "{}" needed by "{}". '.format(dependant, name))
-            pair_list.append((name, dependant))
-            with_dependencies.add(name)
-            with_dependencies.add(dependant)
-    try:
-        ret = topsort(pair_list)
-    except CycleError:
-        raise WrongConfigurationError('Cycled dependencies. ')
-    for name, dependants in dependencies.items():
-        if not name in with_dependencies:
-            ret.append(name)
-    return reversed(ret)
-
-
 class WrongConfigurationError(Exception):
     pass
+
+
+class ShutdownReport(object):
+    """ Result of `Application.stop`. Names are in stop order. """
+
+    def __init__(self):
+        self.stopped = []
+        # name => exception
+        self.failed = {}
+        # stop() did not finish within its budget
+        self.timed_out = []
+        # stop() not called, shutdown deadline passed before
+        self.skipped = []
+
+    def is_clean(self):
+        return not (self.failed or self.timed_out or self.skipped)
+
+
+class InitializationError(Exception):
+    """ Raised when `init()` of one or more components failed. `errors` maps component name => exception. """
+
+    def __init__(self, errors):
+        super(InitializationError, self).__init__('Initialization of components failed: {}. '.format(
+            ', '.join('{} ({!r})'.format(name, errors[name]) for name in sorted(errors))))
+        self.errors = errors
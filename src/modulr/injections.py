@@ -1,50 +1,805 @@
-
+import collections
+import contextvars
 import inspect
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from modulr.profiling import InjectorStats
 
 
 _sentinel = object()
 
+APPLICATION_SCOPE = 'application'
+REQUEST_SCOPE = 'request'
+TASK_SCOPE = 'task'
+
+# free scope containers kept per injector and scope
+_MAX_POOL_SIZE = 64
+
+# bindings are kept as (keys, value, value, ...) tuple until there are more of them, then as dict
+_MAX_TUPLE_BINDINGS = 4
+# shared by all injectors without bindings
+_EMPTY_BINDINGS = ((),)
+# own bindings of up to that many injectors are kept on top of a shared view, see `_View`
+_MAX_VIEW_LAYERS = 8
+# keys tuples shared by small bindings (e.g. all `child(context=...)` injectors), bounded
+_keys_cache = {}
+_keys_lock = threading.Lock()
+_MAX_CACHED_KEYS = 1024
+
+# injector active in the running context (thread or asyncio task), see `Injector.activate`
+_current_injector = contextvars.ContextVar('modulr_current_injector', default=None)
+
 
 class Injector(object):
-    
-    def __init__(self, parent=None, data=None):
+
+    __slots__ = ('_parent', '_data', '_tree', '_flatten', '_view', '_version', '_dependants', '_scope_pools', '__weakref__')
+
+    # set by scope containers only, see `_ScopeContainer`
+    _scope = None
+    _pool = None
+
+    def __init__(self, parent=None, data=None, flatten=None):
+        """ `flatten` - lookup mode for this injector and its descendants (inherited from parent when None): 
+        flattened injector looks bindings up in a merged view of all its ancestors, 
+        so lookup costs the same at any depth. The view is built once per parent and shared by its children, 
+        it keeps only own bindings of the parent on top of the view of the grandparent (see `_View`),
+        and it is rebuilt when the parent or any of its ancestors changes its bindings. """
         self._parent = parent
-        self._data = {} if not data else dict(data)
+        self._data = _create_bindings(data)
+        if parent is None:
+            self._tree = _InjectorTree()
+            self._flatten = bool(flatten)
+        else:
+            self._tree = parent._tree
+            self._flatten = parent._flatten if flatten is None else flatten
+        # merged bindings of this injector and its ancestors, reset when any of them changes
+        self._view = None
+        # bumped when bindings of this injector or of its ancestors change
+        self._version = 0
+        # WeakSet of child injectors and bound callables notified by `_changed`, only ancestors of them have it
+        self._dependants = None
+        # scope => list of free scope containers
+        self._scope_pools = None
 
     def register(self, interface, implementation):
-        if interface in self._data:
-            raise InjectorError('Interface "{}" allready registered'.format(interface))
-        self._data[interface] = implementation
-        
+        # bindings are replaced (read, copy, assign), so writers are serialized
+        with self._tree.lock:
+            if _get_binding(self._data, interface) is not _sentinel:
+                raise InjectorError('Interface "{}" allready registered'.format(interface))
+            self._data = _add_binding(self._data, interface, implementation)
+        self._changed()
+
+    def _changed(self):
+        """ Invalidates cached views and bound callables depending on bindings of this injector. """
+        self._version += 1
+        self._view = None
+        dependants = self._dependants
+        if dependants:
+            # snapshot, dependants may be added by other threads while they are notified
+            with self._tree.lock:
+                dependants = list(dependants)
+            for dependant in dependants:
+                dependant._changed()
+
+    def _add_dependant(self, dependant):
+        """ `dependant` (child injector or bound callable) is notified when bindings of this injector or its ancestors change. """
+        with self._tree.lock:
+            if self._dependants is None:
+                self._dependants = weakref.WeakSet()
+                if self._parent is not None:
+                    self._parent._add_dependant(self)
+            self._dependants.add(dependant)
+
     def register_all(self, **kwargs):
         for interface, implementation in kwargs.items():
             self.register(interface, implementation)
 
+    def register_scoped(self, interface, provider, scope=REQUEST_SCOPE):
+        """ Registers `provider`, called with injections on first `get` in every `scope` container.
+        Instances for APPLICATION_SCOPE are kept by this injector. """
+        self.register_provider(interface, provider, Singleton() if scope == APPLICATION_SCOPE else PerScope(scope))
+
+    def register_provider(self, interface, provider, policy=None):
+        """ Registers `provider`, called with injections when `interface` is requested. 
+        `policy` (`CachePolicy`, `Singleton` by default) decides which instances are reused, 
+        e.g. `PerThread()`, `PerScope(REQUEST_SCOPE)`, `Cached(maxsize=100, ttl=60)`. """
+        if policy is None:
+            policy = Singleton()
+        policy.bind()
+        self.register(interface, Provider(self, provider, policy))
+
+    def get_provider_stats(self, interface):
+        """ Returns hits, misses and evictions of provider bound to `interface`. """
+        ret = self._lookup(interface)
+        if type(ret) is not Provider:
+            raise InjectorError('Interface "{}" is not bound to a provider'.format(interface))
+        return ret.get_policy().get_stats()
+
     def get(self, interface):
-        ret = self._data.get(interface, _sentinel)
+        ret = self._find(interface)
         if ret is _sentinel:
-            if self._parent:
-                return self._parent.get(interface)
-            else:
-                raise InjectorError('Interface "{}" not found'.format(interface))
+            raise InjectorError('Interface "{}" not found'.format(interface))
+        return ret
+
+    def _find(self, interface):
+        stats = self._tree.stats
+        if stats is None:
+            ret = self._lookup(interface)
+        else:
+            ret = self._lookup_with_stats(interface, stats)
+        if type(ret) is Provider:
+            return ret.get(self, interface)
+        return ret
+
+    def _lookup(self, interface):
+        """ Returns binding as registered (providers are not called), or _sentinel. """
+        if self._flatten:
+            ret = _get_binding(self._data, interface)
+            if ret is _sentinel and self._parent is not None:
+                return self._parent._get_view().get(interface, _sentinel)
+            return ret
+        injector = self
+        while injector is not None:
+            ret = _get_binding(injector._data, interface)
+            if ret is not _sentinel:
+                return ret
+            injector = injector._parent
+        return _sentinel
+
+    def _lookup_with_stats(self, interface, stats):
+        """ `_lookup` recording number of parents walked. """
+        depth = 0
+        if self._flatten:
+            ret = _get_binding(self._data, interface)
+            if ret is _sentinel and self._parent is not None:
+                depth = 1
+                ret = self._parent._get_view().get(interface, _sentinel)
+        else:
+            injector = self
+            ret = _get_binding(injector._data, interface)
+            while ret is _sentinel and injector._parent is not None:
+                injector = injector._parent
+                depth += 1
+                ret = _get_binding(injector._data, interface)
+        stats.record_lookup(interface, depth, ret is _sentinel)
         return ret
 
     def call(self, f, **kwargs):
-        injections = dict(kwargs)
-        argspec = inspect.getargspec(f)
-        for argname in argspec[0]:
+        """ Calls `f` with its arguments taken from `kwargs` or injected. 
+        Arguments with default values are left to defaults when interface is not found. """
+        stats = self._tree.stats
+        if stats is not None:
+            return self._call_with_stats(f, kwargs, stats)
+        self._inject(get_call_plan(f), kwargs)
+        return f(**kwargs)
+
+    def _call_with_stats(self, f, kwargs, stats):
+        start = time.perf_counter()
+        self._inject(get_call_plan(f), kwargs)
+        resolved = time.perf_counter()
+        try:
+            return f(**kwargs)
+        finally:
+            stats.record_call(resolved - start, time.perf_counter() - resolved)
+
+    def _inject(self, plan, kwargs):
+        """ Adds injections of arguments in `plan` missing in `kwargs` to it. """
+        for argname in plan.names:
             if argname not in kwargs:
-                injections[argname] = self.get(argname)
-        return f(**injections)
+                value = self._find(argname)
+                if value is _sentinel:
+                    if argname in plan.defaults:
+                        continue
+                    raise InjectorError('Interface "{}" not found'.format(argname))
+                kwargs[argname] = value
+
+    def call_many(self, functions, executor=None, **shared_kwargs):
+        """ Calls all `functions` like `call`, but every interface is resolved once for all of them. 
+        Each function gets only `shared_kwargs` it accepts. Functions are called one by one or on `executor` (`concurrent.futures.Executor`).
+
+        Returns list of results in order of `functions`, exception raised by a function (or its resolution) is put in place of its result.
+        """
+        functions = list(functions)
+        plans = [get_call_plan(f) for f in functions]
+        resolved = dict(shared_kwargs)
+        # name => exception raised by its resolution
+        errors = {}
+        for plan in plans:
+            for name in plan.names:
+                if name not in resolved and name not in errors:
+                    try:
+                        resolved[name] = self._find(name)
+                    except Exception as e:
+                        errors[name] = e
+        calls = []
+        for f, plan in zip(functions, plans):
+            kwargs = {}
+            error = None
+            for name in plan.names:
+                if name in errors:
+                    error = errors[name]
+                    break
+                value = resolved[name]
+                if value is _sentinel:
+                    if name in plan.defaults:
+                        continue
+                    error = InjectorError('Interface "{}" not found'.format(name))
+                    break
+                kwargs[name] = value
+            calls.append((f, kwargs, error))
+        if executor is None:
+            return [_call_or_error(f, kwargs, error) for f, kwargs, error in calls]
+        futures = [None if error is not None else executor.submit(f, **kwargs) for f, kwargs, error in calls]
+        ret = []
+        for future, (f, kwargs, error) in zip(futures, calls):
+            if future is None:
+                ret.append(error)
+                continue
+            try:
+                ret.append(future.result())
+            except Exception as e:
+                ret.append(e)
+        return ret
+
+    def enable_stats(self):
+        """ Starts collecting statistics (`InjectorStats`) of `get` and `call` of this injector, its ancestors and descendants. 
+        Returns statistics, collecting is continued if already enabled. """
+        if self._tree.stats is None:
+            self._tree.stats = InjectorStats()
+        return self._tree.stats
+
+    def disable_stats(self):
+        self._tree.stats = None
+
+    def get_stats(self):
+        """ Returns `InjectorStats` or None when statistics are disabled. """
+        return self._tree.stats
+
+    def _get_view(self):
+        if self._parent is None and self._data.__class__ is dict:
+            return self._data
+        view = self._view
+        if view is None:
+            version = self._version
+            if self._parent is None:
+                view = _to_dict(self._data)
+            else:
+                self._parent._add_dependant(self)
+                view = _View.create(self._data, self._parent._get_view())
+            # not cached if bindings changed meanwhile
+            if version == self._version:
+                self._view = view
+        return view
+
+    def bind(self, f):
+        """ Returns callable calling `f` with injections resolved once, it accepts only not injected kwargs (or overrides).
+
+        Injections are resolved again when bindings of this injector or of its ancestors change. 
+        Providers are still asked for instance on every call (their policy decides if it is reused).
+        """
+        return BoundCall(self, f)
 
     def child(self, **kwargs):
-        ret = Injector(self)
-        ret.register_all(**kwargs)
+        return Injector(self, kwargs)
+
+    def scope(self, scope, **kwargs):
+        """ Returns child injector being container of `scope` (e.g. REQUEST_SCOPE) with `kwargs` registered.
+
+        Containers are pooled: use returned injector as context manager or call its `release()`,
+        then it is reset and reused by next `scope` call instead of allocating new one.
+        """
+        pools = self._scope_pools
+        if pools is None:
+            pools = self._scope_pools = {}
+        pool = pools.get(scope)
+        if pool is None:
+            pool = pools.setdefault(scope, [])
+        try:
+            ret = pool.pop()
+        except IndexError:
+            ret = _ScopeContainer(self, scope, pool)
+        ret._released = False
+        if kwargs:
+            ret.register_all(**kwargs)
         return ret
 
+    def activate(self):
+        """ Returns context manager making this injector current in the running context (thread or asyncio task).
+
+        Tasks and threads get their own current injector, so concurrent requests need no locking.
+        New asyncio tasks start with the injector current where they were created.
+        """
+        return _Activation(self, False)
+
+    def activate_child(self, scope=None, **kwargs):
+        """ Returns context manager making child of this injector with `kwargs` registered current.
+        When `scope` is given the child is pooled container of `scope` (see `scope`), released on exit. """
+        if scope is None:
+            return _Activation(Injector(self, kwargs), False)
+        return _Activation(self.scope(scope, **kwargs), True)
+
+    @staticmethod
+    def current():
+        """ Returns injector current in the running context. """
+        ret = _current_injector.get()
+        if ret is None:
+            raise InjectorError('No active injector')
+        return ret
+
+    @staticmethod
+    def call_current(f, **kwargs):
+        """ `call` of the injector current in the running context. """
+        return Injector.current().call(f, **kwargs)
+
+    def release(self):
+        """ Resets scope container (drops its registrations and scoped instances) and returns it to the pool. """
+        if self._pool is None:
+            raise InjectorError('Only scope containers can be released')
+        if self._released:
+            raise InjectorError('Scope container already released')
+        self._released = True
+        self._data = _EMPTY_BINDINGS
+        self._changed()
+        if len(self._pool) < _MAX_POOL_SIZE:
+            self._pool.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._pool is not None and not self._released:
+            self.release()
+
+
+class _ScopeContainer(Injector):
+    """ Injector returned by `Injector.scope`. """
+
+    __slots__ = ('_scope', '_pool', '_released', '_lock')
+
+    def __init__(self, parent, scope, pool):
+        super(_ScopeContainer, self).__init__(parent)
+        self._scope = scope
+        # pool this container returns to on release
+        self._pool = pool
+        # released and not in use
+        self._released = False
+        # guards creation of scoped instances, reentrant as providers may need other scoped instances
+        self._lock = threading.RLock()
+
+
+class _Activation(object):
+
+    __slots__ = ('_injector', '_release', '_token')
+
+    def __init__(self, injector, release):
+        self._injector = injector
+        self._release = release
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_injector.set(self._injector)
+        return self._injector
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _current_injector.reset(self._token)
+        self._token = None
+        if self._release:
+            self._injector.release()
+
+
+class _InjectorTree(object):
+    """ State shared by an injector and all its descendants. """
+
+    __slots__ = ('stats', 'lock')
+
+    def __init__(self):
+        # InjectorStats when enabled
+        self.stats = None
+        # guards bindings and dependants of injectors of the tree, reentrant as registration walks up to the root
+        self.lock = threading.RLock()
+
+
+class _View(object):
+    """ Merged bindings of an injector and its ancestors for flattened lookup: 
+    own bindings of the nearest injectors (`layers`, nearest first) over a dict merged from the farther ones (`base`).
+    Views share the parent view, layers are merged into a new base only when there are more than `_MAX_VIEW_LAYERS` of them. """
+
+    __slots__ = ('layers', 'base')
+
+    def __init__(self, layers, base):
+        self.layers = layers
+        self.base = base
+
+    @classmethod
+    def create(cls, data, parent_view):
+        if data is _EMPTY_BINDINGS:
+            return parent_view
+        if parent_view.__class__ is cls:
+            layers = (data,) + parent_view.layers
+            base = parent_view.base
+        else:
+            layers = (data,)
+            base = parent_view
+        if len(layers) <= _MAX_VIEW_LAYERS:
+            return cls(layers, base)
+        base = dict(base)
+        for layer in reversed(layers):
+            base.update(_to_dict(layer))
+        return base
+
+    def get(self, interface, default):
+        for layer in self.layers:
+            ret = _get_binding(layer, interface)
+            if ret is not _sentinel:
+                return ret
+        return self.base.get(interface, default)
+
+
+class BoundCall(object):
+    """ Callable returned by `Injector.bind`. """
+
+    __slots__ = ('_injector', '_f', '_plan', '_valid', '_injections', '_dynamic', '_missing', '__weakref__')
+
+    def __init__(self, injector, f):
+        self._injector = injector
+        self._f = f
+        self._plan = get_call_plan(f)
+        injector._add_dependant(self)
+        self._resolve()
+
+    def _changed(self):
+        self._valid = False
+
+    def _resolve(self):
+        injector = self._injector
+        # set first, so changes made while resolving are noticed by the next call
+        self._valid = True
+        injections = {}
+        dynamic = []
+        missing = []
+        for name in self._plan.names:
+            value = injector._lookup(name)
+            if value is _sentinel:
+                if name not in self._plan.defaults:
+                    missing.append(name)
+            elif type(value) is Provider:
+                dynamic.append(name)
+            else:
+                injections[name] = value
+        self._injections = injections
+        self._dynamic = tuple(dynamic)
+        self._missing = tuple(missing)
+
+    def __call__(self, **kwargs):
+        if not self._valid:
+            self._resolve()
+        for name in self._missing:
+            if name not in kwargs:
+                raise InjectorError('Interface "{}" not found'.format(name))
+        if not kwargs and not self._dynamic:
+            return self._f(**self._injections)
+        injections = dict(self._injections)
+        for name in self._dynamic:
+            if name not in kwargs:
+                injections[name] = self._injector._find(name)
+        injections.update(kwargs)
+        return self._f(**injections)
+
+
+class Provider(object):
+    """ Binding registered by `Injector.register_provider`. """
+
+    __slots__ = ('_owner', '_provider', '_policy')
+
+    def __init__(self, owner, provider, policy):
+        self._owner = owner
+        self._provider = provider
+        self._policy = policy
+
+    def get_policy(self):
+        return self._policy
+
+    def get(self, injector, interface):
+        return self._policy.get(self, injector, interface)
+
+
+class CachePolicy(object):
+    """ Decides when `Provider` is called and keeps its instances. 
+    Policy keeps state of one binding, so its instance can not be shared by bindings. """
+
+    __slots__ = ('hits', 'misses', 'evictions', '_bound', '_stats_lock')
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bound = False
+        self._stats_lock = threading.Lock()
+
+    def _count(self, hits=0, misses=0, evictions=0):
+        """ Updates counters, `+=` on attributes is not atomic across threads. """
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += misses
+            self.evictions += evictions
+
+    def bind(self):
+        if self._bound:
+            raise InjectorError('{} is already used by another binding'.format(type(self).__name__))
+        self._bound = True
+
+    def get(self, provider, injector, interface):
+        raise NotImplementedError()
+
+    def get_stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+class Singleton(CachePolicy):
+    """ One instance created on first `get`, with injections of the injector the provider is registered in. """
+
+    __slots__ = ('_instance', '_lock')
+
+    def __init__(self):
+        super(Singleton, self).__init__()
+        self._instance = _sentinel
+        self._lock = threading.Lock()
+
+    def get(self, provider, injector, interface):
+        if self._instance is not _sentinel:
+            self._count(hits=1)
+            return self._instance
+        with self._lock:
+            if self._instance is _sentinel:
+                self._count(misses=1)
+                self._instance = provider._owner.call(provider._provider)
+            else:
+                self._count(hits=1)
+        return self._instance
+
+
+class PerThread(CachePolicy):
+    """ One instance per thread, with injections of the injector the provider is registered in. """
+
+    __slots__ = ('_local',)
+
+    def __init__(self):
+        super(PerThread, self).__init__()
+        self._local = threading.local()
+
+    def get(self, provider, injector, interface):
+        ret = getattr(self._local, 'instance', _sentinel)
+        if ret is _sentinel:
+            self._count(misses=1)
+            ret = self._local.instance = provider._owner.call(provider._provider)
+        else:
+            self._count(hits=1)
+        return ret
+
+
+class PerScope(CachePolicy):
+    """ One instance per container of `scope` (see `Injector.scope`), with injections of the container. 
+    Instances are dropped when container is released. Use `Singleton` for APPLICATION_SCOPE. """
+
+    __slots__ = ('_scope',)
+
+    def __init__(self, scope=REQUEST_SCOPE):
+        super(PerScope, self).__init__()
+        self._scope = scope
+
+    def get(self, provider, injector, interface):
+        container = injector
+        while container is not None and container._scope != self._scope:
+            container = container._parent
+        if container is None:
+            raise InjectorError('Interface "{}" needs active "{}" scope'.format(interface, self._scope))
+        ret = _get_binding(container._data, interface)
+        if ret is not _sentinel:
+            self._count(hits=1)
+            return ret
+        with container._lock:
+            # another thread may have created it meanwhile
+            ret = _get_binding(container._data, interface)
+            if ret is _sentinel:
+                self._count(misses=1)
+                ret = container.call(provider._provider)
+                with container._tree.lock:
+                    container._data = _add_binding(container._data, interface, ret)
+            else:
+                self._count(hits=1)
+        return ret
+
+
+class Cached(CachePolicy):
+    """ Keeps up to `maxsize` instances (least recently used are evicted), each for at most `ttl` seconds (None - no limit).
+
+    `key` - callable called with injections, its result selects instance (e.g. `lambda tenant: tenant` for per-tenant clients),
+    provider is then called with injections of the injector `get` is called on. 
+    Without `key` there is a single instance created with injections of the injector the provider is registered in.
+    Concurrent misses of one key wait for a single provider call.
+    """
+
+    __slots__ = ('_maxsize', '_ttl', '_key', '_instances', '_creating', '_lock')
+
+    def __init__(self, maxsize=128, ttl=None, key=None):
+        super(Cached, self).__init__()
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._key = key
+        # key => (instance, expiration time or None), least recently used first
+        self._instances = collections.OrderedDict()
+        # key => Future of instance being created, concurrent misses wait for it
+        self._creating = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider, injector, interface):
+        if self._key is None:
+            key = None
+            injector = provider._owner
+        else:
+            key = injector.call(self._key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._instances.get(key)
+            if entry is not None:
+                if entry[1] is None or entry[1] > now:
+                    self.hits += 1
+                    self._instances.move_to_end(key)
+                    return entry[0]
+                del self._instances[key]
+                self.evictions += 1
+            creating = self._creating.get(key)
+            if creating is None:
+                self.misses += 1
+                future = self._creating[key] = Future()
+            else:
+                self.hits += 1
+        if creating is not None:
+            return creating.result()
+        try:
+            instance = injector.call(provider._provider)
+        except BaseException as e:
+            with self._lock:
+                del self._creating[key]
+            future.set_exception(e)
+            raise
+        expires = None if self._ttl is None else time.monotonic() + self._ttl
+        with self._lock:
+            del self._creating[key]
+            self._instances[key] = (instance, expires)
+            self._instances.move_to_end(key)
+            while len(self._instances) > self._maxsize:
+                self._instances.popitem(last=False)
+                self.evictions += 1
+        future.set_result(instance)
+        return instance
+
+    def clear(self):
+        with self._lock:
+            self._instances.clear()
+
+
+def _call_or_error(f, kwargs, error):
+    if error is not None:
+        return error
+    try:
+        return f(**kwargs)
+    except Exception as e:
+        return e
+
+
+def _create_bindings(data):
+    if not data:
+        return _EMPTY_BINDINGS
+    if len(data) > _MAX_TUPLE_BINDINGS:
+        return dict(data)
+    return (_share_keys(tuple(data)),) + tuple(data.values())
+
+
+def _share_keys(keys):
+    ret = _keys_cache.get(keys)
+    if ret is None:
+        with _keys_lock:
+            ret = _keys_cache.get(keys)
+            if ret is None:
+                if len(_keys_cache) >= _MAX_CACHED_KEYS:
+                    return keys
+                ret = _keys_cache[keys] = keys
+    return ret
+
+
+def _get_binding(data, interface):
+    """ Returns value bound to `interface` in bindings `data` or _sentinel. """
+    if data.__class__ is dict:
+        return data.get(interface, _sentinel)
+    keys = data[0]
+    if interface in keys:
+        return data[keys.index(interface) + 1]
+    return _sentinel
+
+
+def _add_binding(data, interface, value):
+    """ Returns bindings `data` with `interface` added, `data` is changed in place only if it is a dict. """
+    if data.__class__ is dict:
+        data[interface] = value
+        return data
+    keys = data[0]
+    if len(keys) < _MAX_TUPLE_BINDINGS:
+        return (_share_keys(keys + (interface,)),) + data[1:] + (value,)
+    ret = dict(zip(keys, data[1:]))
+    ret[interface] = value
+    return ret
+
+
+def _to_dict(data):
+    if data.__class__ is dict:
+        return data
+    return dict(zip(data[0], data[1:]))
+
+
+class CallPlan(object):
+    """ What `Injector.call` needs to know about a callable, computed once by `get_call_plan`. """
+
+    __slots__ = ('names', 'keyword_only', 'defaults', '_bound_plan')
+
+    def __init__(self, names, keyword_only, defaults):
+        # names of arguments which may be passed by keyword, keyword-only included
+        self.names = names
+        self.keyword_only = keyword_only
+        # name => default value
+        self.defaults = defaults
+        self._bound_plan = None
+
+    @classmethod
+    def from_callable(cls, f):
+        names = []
+        keyword_only = []
+        defaults = {}
+        for parameter in inspect.signature(f).parameters.values():
+            if parameter.kind not in (parameter.POSITIONAL_OR_KEYWORD, parameter.KEYWORD_ONLY):
+                continue
+            names.append(parameter.name)
+            if parameter.kind == parameter.KEYWORD_ONLY:
+                keyword_only.append(parameter.name)
+            if parameter.default is not parameter.empty:
+                defaults[parameter.name] = parameter.default
+        return cls(tuple(names), tuple(keyword_only), defaults)
+
+    def get_bound_plan(self):
+        """ Plan of the function bound as a method, i.e. without its first argument. """
+        if self._bound_plan is None:
+            first = self.names[:1]
+            self._bound_plan = CallPlan(self.names[1:], self.keyword_only, dict((name, value) for name, value in self.defaults.items() if (name,) != first))
+        return self._bound_plan
+
+
+# callable => CallPlan, entries are dropped with the callables
+_call_plans = weakref.WeakKeyDictionary()
+
+
+def get_call_plan(f):
+    """ Returns cached `CallPlan` of `f`. Bound methods share plan of their function. """
+    function = getattr(f, '__func__', None)
+    if function is not None and getattr(f, '__self__', None) is not None:
+        return _get_cached_call_plan(function).get_bound_plan()
+    return _get_cached_call_plan(f)
+
+
+def _get_cached_call_plan(f):
+    try:
+        plan = _call_plans.get(f)
+    except TypeError:
+        # not weak-referenceable (or not hashable), can not be cached
+        return CallPlan.from_callable(f)
+    if plan is None:
+        plan = _call_plans[f] = CallPlan.from_callable(f)
+    return plan
+
 
 def get_injections(fun):
-    return set(inspect.getargspec(fun)[0])
+    return set(get_call_plan(fun).names)
 
 
 class InjectorError(Exception):
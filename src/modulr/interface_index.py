@@ -0,0 +1,52 @@
+class InterfaceIndex(object):
+    """ Index of components by interfaces they implement.
+
+    Interfaces are interned to integer ids, providers of every interface are kept 
+    in a dict used as ordered set (registration order, O(1) membership and removal), 
+    and the only provider of an interface is precomputed, so resolving a requirement is O(1).
+    """
+
+    def __init__(self):
+        # interface => id
+        self._ids = {}
+        # id => {name: None}
+        self._providers = []
+        # id => name of the only provider, or None
+        self._unique = []
+
+    def _get_id(self, interface):
+        interface_id = self._ids.get(interface)
+        if interface_id is None:
+            interface_id = self._ids[interface] = len(self._providers)
+            self._providers.append({})
+            self._unique.append(None)
+        return interface_id
+
+    def add(self, interface, name):
+        interface_id = self._get_id(interface)
+        providers = self._providers[interface_id]
+        providers[name] = None
+        self._update_unique(interface_id, providers)
+
+    def remove(self, interface, name):
+        interface_id = self._ids[interface]
+        providers = self._providers[interface_id]
+        del providers[name]
+        self._update_unique(interface_id, providers)
+
+    def _update_unique(self, interface_id, providers):
+        self._unique[interface_id] = next(iter(providers)) if len(providers) == 1 else None
+
+    def get_providers(self, interface):
+        """ Returns names of providers in registration order. """
+        interface_id = self._ids.get(interface)
+        return [] if interface_id is None else list(self._providers[interface_id])
+
+    def has_provider(self, interface, name):
+        interface_id = self._ids.get(interface)
+        return interface_id is not None and name in self._providers[interface_id]
+
+    def get_unique_provider(self, interface):
+        """ Returns the only provider of `interface`, or None when there is no provider or many of them. """
+        interface_id = self._ids.get(interface)
+        return None if interface_id is None else self._unique[interface_id]
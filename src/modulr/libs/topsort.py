@@ -23,6 +23,7 @@ Modifications:
 - added a topsort_levels version that ports items in each dependency level
   into a sub-list
 - added find_cycles to aid in cycle debugging
+- topsort_levels_core returns instead of raising StopIteration (PEP 479)
 
 Run this module directly to run the doctests (unittests).
 Make sure they all pass before checking in any modifications.
@@ -227,9 +228,7 @@ def topsort_levels_core(num_parents, children):
         # Everything in num_parents has at least one child -> 
         # there's a cycle.
         raise CycleError(num_parents, children)
-    else:
-        # This is the end of the generator.
-        raise StopIteration
+    # This is the end of the generator (PEP 479: no explicit StopIteration).
 
 
 def find_cycles(parent_children):
@@ -0,0 +1,167 @@
+import heapq
+
+
+class DynamicTopologicalOrder(object):
+    """ Topological order of a graph maintained incrementally while nodes and edges are added and removed.
+
+    Uses Pearce-Kelly algorithm: adding edge `a -> b` only reorders nodes placed between `b` and `a`,
+    instead of sorting the whole graph again.
+    Edges that would close a cycle are not inserted but kept as blocked,
+    they are inserted again as soon as removal of other edges makes it possible.
+
+    Dependency levels are maintained too: a change recomputes levels of the nodes it reaches only,
+    and `get_levels` rebuilds only levels whose members changed.
+    """
+
+    def __init__(self):
+        # node => position, positions are unique but not necessarily contiguous
+        self._position = {}
+        self._next_position = 0
+        self._successors = {}
+        self._predecessors = {}
+        # blocked edges, dict used as ordered set
+        self._blocked = {}
+        # node => level: 0 without predecessors, otherwise 1 + highest level of predecessors
+        self._level = {}
+        # nodes of every level, dicts used as ordered sets
+        self._levels = []
+        # tuples of `_levels` returned by `get_levels`, None for changed levels
+        self._level_tuples = []
+
+    def __contains__(self, node):
+        return node in self._position
+
+    def add_node(self, node):
+        self._position[node] = self._next_position
+        self._next_position += 1
+        self._successors[node] = set()
+        self._predecessors[node] = set()
+        self._set_level(node, 0)
+
+    def remove_node(self, node):
+        successors = self._successors.pop(node)
+        for successor in successors:
+            self._predecessors[successor].discard(node)
+        for predecessor in self._predecessors.pop(node):
+            self._successors[predecessor].discard(node)
+        self._remove_from_level(node)
+        del self._level[node]
+        del self._position[node]
+        self._update_levels(successors)
+        for edge in [edge for edge in self._blocked if node in edge]:
+            del self._blocked[edge]
+        self._retry_blocked()
+
+    def add_edge(self, a, b):
+        """ Adds edge: `a` must be placed before `b`. Returns False if the edge closes a cycle (edge becomes blocked). """
+        if b in self._successors[a] or (a, b) in self._blocked:
+            return (a, b) not in self._blocked
+        if not self._insert(a, b):
+            self._blocked[(a, b)] = None
+            return False
+        return True
+
+    def remove_edge(self, a, b):
+        if (a, b) in self._blocked:
+            del self._blocked[(a, b)]
+        else:
+            self._successors[a].discard(b)
+            self._predecessors[b].discard(a)
+            self._update_levels([b])
+            self._retry_blocked()
+
+    def get_blocked_edges(self):
+        return list(self._blocked)
+
+    def get_order(self):
+        return sorted(self._position, key=self._position.__getitem__)
+
+    def get_levels(self):
+        """ Returns list of levels (tuples of nodes): nodes of a level have predecessors only in previous levels. 
+        Nodes of a level are in order they joined it. """
+        tuples = self._level_tuples
+        for index, level in enumerate(self._levels):
+            if tuples[index] is None:
+                tuples[index] = tuple(level)
+        return list(tuples)
+
+    def _set_level(self, node, level):
+        while len(self._levels) <= level:
+            self._levels.append({})
+            self._level_tuples.append(None)
+        self._levels[level][node] = None
+        self._level_tuples[level] = None
+        self._level[node] = level
+
+    def _remove_from_level(self, node):
+        level = self._level[node]
+        del self._levels[level][node]
+        self._level_tuples[level] = None
+        # only the last levels may become empty
+        while self._levels and not self._levels[-1]:
+            self._levels.pop()
+            self._level_tuples.pop()
+
+    def _update_levels(self, nodes):
+        """ Recomputes levels of `nodes` and of nodes reachable from them whose level changes. 
+        Nodes are visited in topological order, so every node is recomputed once. """
+        position = self._position
+        heap = [(position[node], node) for node in set(nodes)]
+        heapq.heapify(heap)
+        queued = set(nodes)
+        while heap:
+            node = heapq.heappop(heap)[1]
+            level = 0
+            for predecessor in self._predecessors[node]:
+                level = max(level, self._level[predecessor] + 1)
+            if level == self._level[node]:
+                continue
+            self._remove_from_level(node)
+            self._set_level(node, level)
+            for successor in self._successors[node]:
+                if successor not in queued:
+                    queued.add(successor)
+                    heapq.heappush(heap, (position[successor], successor))
+
+    def _retry_blocked(self):
+        for edge in list(self._blocked):
+            if self._insert(*edge):
+                del self._blocked[edge]
+
+    def _insert(self, a, b):
+        lower_bound = self._position[b]
+        upper_bound = self._position[a]
+        if a == b:
+            return False
+        if lower_bound < upper_bound:
+            forward = self._discover(b, self._successors, lambda position: position < upper_bound, a)
+            if forward is None:
+                return False
+            backward = self._discover(a, self._predecessors, lambda position: position > lower_bound, None)
+            self._reorder(backward, forward)
+        self._successors[a].add(b)
+        self._predecessors[b].add(a)
+        self._update_levels([b])
+        return True
+
+    def _discover(self, start, edges, in_bounds, cycle_node):
+        """ Nodes reachable from `start` within bounds, None if `cycle_node` is reachable. """
+        visited = set([start])
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for next_node in edges[node]:
+                if next_node == cycle_node:
+                    return None
+                if next_node not in visited and in_bounds(self._position[next_node]):
+                    visited.add(next_node)
+                    stack.append(next_node)
+        return visited
+
+    def _reorder(self, backward, forward):
+        position = self._position
+        backward = sorted(backward, key=position.__getitem__)
+        forward = sorted(forward, key=position.__getitem__)
+        positions = sorted(position[node] for node in backward + forward)
+        for node, new_position in zip(backward + forward, positions):
+            position[node] = new_position
@@ -0,0 +1,33 @@
+import json
+import os
+import tempfile
+
+
+class StartupPlanCache(object):
+    """ Keeps resolved startup plans in `directory`, one small JSON file per configuration fingerprint. """
+
+    def __init__(self, directory):
+        self._directory = directory
+
+    def _get_path(self, fingerprint):
+        return os.path.join(self._directory, 'plan-{}.json'.format(fingerprint))
+
+    def load(self, fingerprint):
+        """ Returns stored plan data or None when there is no (readable) entry. """
+        try:
+            with open(self._get_path(fingerprint)) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def store(self, fingerprint, data):
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory)
+        fd, temporary_path = tempfile.mkstemp(dir=self._directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(temporary_path, self._get_path(fingerprint))
+        except Exception:
+            os.remove(temporary_path)
+            raise
@@ -0,0 +1,189 @@
+import json
+import sys
+import threading
+import time
+
+
+_thread_time = getattr(time, 'thread_time', time.process_time)
+
+
+class StartupProfiler(object):
+    """ Records wall and CPU time of every component creation and `init()` call made by `Application`. """
+
+    CREATE = 'create'
+    INIT = 'init'
+
+    def __init__(self):
+        # name => ComponentTiming
+        self._timings = {}
+
+    def measure(self, phase, name, function, *args):
+        wall = time.perf_counter()
+        cpu = _thread_time()
+        try:
+            return function(*args)
+        finally:
+            self._record(phase, name, time.perf_counter() - wall, _thread_time() - cpu)
+
+    async def measure_async(self, phase, name, awaitable):
+        """ Measures wall time only, CPU time of a coroutine can not be told apart from other tasks on the loop. """
+        wall = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self._record(phase, name, time.perf_counter() - wall, None)
+
+    def _record(self, phase, name, wall, cpu):
+        timing = self._timings.setdefault(name, ComponentTiming(name))
+        setattr(timing, phase + '_wall_time', getattr(timing, phase + '_wall_time') + wall)
+        if cpu is not None:
+            setattr(timing, phase + '_cpu_time', getattr(timing, phase + '_cpu_time') + cpu)
+
+    def get_report(self, plan):
+        """ Returns `StartupReport` for components of `plan` (a `StartupPlan`). """
+        timings = []
+        # name => (time when component is ready with unlimited parallelism, previous component on the path)
+        finished = {}
+        for name in plan.get_order():
+            timing = self._timings.get(name) or ComponentTiming(name)
+            timings.append(timing)
+            start, previous = 0.0, None
+            for required_component in plan.get_injections(name).values():
+                if finished[required_component][0] > start:
+                    start, previous = finished[required_component][0], required_component
+            finished[name] = (start + timing.get_wall_time(), previous)
+        critical_path = []
+        if finished:
+            name = max(finished, key=lambda name: finished[name][0])
+            critical_path_time = finished[name][0]
+            while name is not None:
+                critical_path.append(name)
+                name = finished[name][1]
+            critical_path.reverse()
+        else:
+            critical_path_time = 0.0
+        return StartupReport(timings, critical_path, critical_path_time)
+
+
+class ComponentTiming(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.create_wall_time = 0.0
+        self.create_cpu_time = 0.0
+        self.init_wall_time = 0.0
+        self.init_cpu_time = 0.0
+
+    def get_wall_time(self):
+        return self.create_wall_time + self.init_wall_time
+
+    def get_cpu_time(self):
+        return self.create_cpu_time + self.init_cpu_time
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'create_wall_time': self.create_wall_time,
+            'create_cpu_time': self.create_cpu_time,
+            'init_wall_time': self.init_wall_time,
+            'init_cpu_time': self.init_cpu_time,
+        }
+
+
+class StartupReport(object):
+    """ Timings of all components (in start order) and the critical path:
+    the chain of dependencies that bounds startup time even with unlimited parallelism. """
+
+    def __init__(self, timings, critical_path, critical_path_time):
+        self.timings = timings
+        self.critical_path = critical_path
+        self.critical_path_time = critical_path_time
+
+    def get_total_wall_time(self):
+        return sum(timing.get_wall_time() for timing in self.timings)
+
+    def to_dict(self):
+        return {
+            'components': [timing.to_dict() for timing in self.timings],
+            'critical_path': list(self.critical_path),
+            'critical_path_time': self.critical_path_time,
+            'total_wall_time': self.get_total_wall_time(),
+        }
+
+    def format(self):
+        lines = ['{:<40} {:>12} {:>12} {:>12} {:>12}'.format('component', 'create wall', 'create cpu', 'init wall', 'init cpu')]
+        for timing in sorted(self.timings, key=lambda timing: -timing.get_wall_time()):
+            lines.append('{:<40} {:>12.6f} {:>12.6f} {:>12.6f} {:>12.6f}'.format(
+                timing.name, timing.create_wall_time, timing.create_cpu_time, timing.init_wall_time, timing.init_cpu_time))
+        lines.append('total wall time: {:.6f}'.format(self.get_total_wall_time()))
+        lines.append('critical path ({:.6f}): {}'.format(self.critical_path_time, ' -> '.join(self.critical_path)))
+        return '\n'.join(lines)
+
+
+def startup_profile_script(application):
+    """ Returns script handler printing startup report of `application`, `--json` argument switches output to JSON. """
+    def script(args):
+        report = application.get_startup_report()
+        if '--json' in args:
+            sys.stdout.write(json.dumps(report.to_dict(), indent=2) + '\n')
+        else:
+            sys.stdout.write(report.format() + '\n')
+        return report
+    return script
+
+
+class InjectorStats(object):
+    """ Statistics of `Injector.get` and `Injector.call` of an injector tree, see `Injector.enable_stats`. 
+    `depth` is number of parents walked by a lookup. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # interface => count
+        self._lookups = {}
+        self._misses = {}
+        self._depth = 0
+        self._calls = 0
+        self._resolve_time = 0.0
+        self._call_time = 0.0
+
+    def record_lookup(self, interface, depth, miss):
+        with self._lock:
+            self._lookups[interface] = self._lookups.get(interface, 0) + 1
+            self._depth += depth
+            if miss:
+                self._misses[interface] = self._misses.get(interface, 0) + 1
+
+    def record_call(self, resolve_time, call_time):
+        with self._lock:
+            self._calls += 1
+            self._resolve_time += resolve_time
+            self._call_time += call_time
+
+    def get_average_depth(self):
+        lookups = sum(self._lookups.values())
+        return float(self._depth) / lookups if lookups else 0.0
+
+    def snapshot(self):
+        """ Returns copy of current statistics as dict of plain values. """
+        with self._lock:
+            return {
+                'lookups': dict(self._lookups),
+                'misses': dict(self._misses),
+                'average_depth': self.get_average_depth(),
+                'calls': self._calls,
+                'resolve_time': self._resolve_time,
+                'call_time': self._call_time,
+            }
+
+    def export_json(self, f):
+        """ Writes snapshot to file object `f` as JSON. """
+        json.dump(self.snapshot(), f, indent=2, sort_keys=True)
+
+    def reset(self):
+        with self._lock:
+            self._lookups.clear()
+            self._misses.clear()
+            self._depth = 0
+            self._calls = 0
+            self._resolve_time = 0.0
+            self._call_time = 0.0
@@ -1,3 +1,30 @@
+from modulr.utils import import_by_path
+
+
+class ScriptInfo(object):
+    """ Registered script. Handler given as "package.module:function" path is imported on first use. 
+    `requires` - interfaces the script needs (a list, single interface given as a string is rejected). """
+
+    def __init__(self, name, handler, help=None, requires=()):
+        if isinstance(requires, str):
+            raise ValueError('Script {} requires must be a list of interfaces, not a string: {!r}. '.format(name, requires))
+        self.name = name
+        self.help = help
+        self.requires = list(requires)
+        if isinstance(handler, str):
+            self.path = handler
+            self._handler = None
+        else:
+            self.path = None
+            self._handler = handler
+
+    def is_loaded(self):
+        return self._handler is not None
+
+    def get_handler(self):
+        if self._handler is None:
+            self._handler = import_by_path(self.path)
+        return self._handler
 
 
 class ScriptsManager(object):
@@ -5,15 +32,24 @@ class ScriptsManager(object):
     def __init__(self):
         self._registry = {}
         
-    def register(self, script_name, handler):
+    def register(self, script_name, handler, help=None, requires=()):
+        """ `handler` - callable or its dotted path, imported only when the script is run. """
         if script_name in self._registry:
             raise ValueError('Script {} allready registered. '.format(script_name))
-        self._registry[script_name] = handler
-    
-    def run_script(self, script_name, args):
+        self._registry[script_name] = ScriptInfo(script_name, handler, help, requires)
+
+    def get_script_info(self, script_name):
         if not script_name in self._registry:
             raise ValueError('Unknown script: {}.'.format(script_name))
-        return self._registry[script_name](args)
+        return self._registry[script_name]
+
+    def list_scripts(self):
+        """ Returns `ScriptInfo` of all scripts sorted by name, no handler is imported. """
+        return [self._registry[name] for name in sorted(self._registry)]
+    
+    def run_script(self, script_name, args, **components):
+        """ `components` - passed to the handler as keyword arguments, see `Application.run_script_from_args`. """
+        return self.get_script_info(script_name).get_handler()(args, **components)
 
     def run_script_from_args(self, parameters):
         script_name = parameters[0]
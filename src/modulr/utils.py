@@ -0,0 +1,13 @@
+import importlib
+
+
+def import_by_path(path):
+    """ Imports object given by "package.module:attribute" path ("package.module.attribute" is accepted too). """
+    if ':' in path:
+        module_name, attribute = path.split(':', 1)
+    else:
+        module_name, _, attribute = path.rpartition('.')
+    ret = importlib.import_module(module_name)
+    for part in attribute.split('.'):
+        ret = getattr(ret, part)
+    return ret
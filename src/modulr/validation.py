@@ -0,0 +1,146 @@
+MISSING_PROVIDER = 'missing_provider'
+AMBIGUOUS_PROVIDER = 'ambiguous_provider'
+WRONG_MAPPING = 'wrong_mapping'
+UNUSED_MAPPING = 'unused_mapping'
+FORK_UNSAFE_DEPENDENCY = 'fork_unsafe_dependency'
+CYCLE = 'cycle'
+
+# kinds of problems `compile()` accepts, reported but ignored by `ValidationResult.is_valid`
+WARNINGS = frozenset([UNUSED_MAPPING])
+
+
+class ConfigurationProblem(object):
+    """ One problem found by `validate_registry`. `members` are names of components forming a cycle. """
+
+    def __init__(self, kind, message, component=None, interface=None, candidates=(), members=()):
+        self.kind = kind
+        self.message = message
+        self.component = component
+        self.interface = interface
+        self.candidates = list(candidates)
+        self.members = list(members)
+
+    def is_warning(self):
+        return self.kind in WARNINGS
+
+    def __repr__(self):
+        return '<ConfigurationProblem {}: {}>'.format(self.kind, self.message)
+
+
+class ValidationResult(object):
+
+    def __init__(self, problems):
+        self.problems = problems
+
+    def is_valid(self):
+        """ True when `compile()` would succeed, i.e. there are no problems other than warnings (see `WARNINGS`). """
+        return not self.get_errors()
+
+    def get_errors(self):
+        return [problem for problem in self.problems if not problem.is_warning()]
+
+    def get_warnings(self):
+        return [problem for problem in self.problems if problem.is_warning()]
+
+    def get_problems(self, kind=None):
+        return [problem for problem in self.problems if kind is None or problem.kind == kind]
+
+    def format(self):
+        return '\n'.join(problem.message for problem in self.problems)
+
+
+def validate_registry(component_factory_registry):
+    """ Checks whole registry in one pass, without creating any component. Returns `ValidationResult` with all problems. """
+    registry = component_factory_registry
+    problems = []
+    # name => names of components it depends on
+    dependencies = {}
+    names = registry.get_names()
+    for name in names:
+        configured_factory = registry.get_by_name(name)
+        requires = configured_factory.get_constraints().get_requires()
+        requirements_mapping = configured_factory.get_requirements_mapping()
+        dependencies[name] = required_components = []
+        for require in requires:
+            chosen_candidate = requirements_mapping.get(require)
+            if chosen_candidate:
+                if registry.implements(chosen_candidate, require):
+                    required_components.append(chosen_candidate)
+                else:
+                    problems.append(ConfigurationProblem(WRONG_MAPPING,
+                        'Component {} requires {}, but choosen components {} does not implement it. '.format(name, require, chosen_candidate),
+                        name, require, [chosen_candidate]))
+                continue
+            required_component = registry.get_unique_by_implements(require)
+            if required_component is not None:
+                required_components.append(required_component)
+                continue
+            candidates = registry.get_by_implements(require)
+            if not candidates:
+                problems.append(ConfigurationProblem(MISSING_PROVIDER,
+                    'Component {} requires {}, but no component implements it. '.format(name, require),
+                    name, require))
+            else:
+                problems.append(ConfigurationProblem(AMBIGUOUS_PROVIDER,
+                    'Component {} requires {}, but too many components implements it: {}. Choose one. '.format(name, require, ', '.join(candidates)),
+                    name, require, candidates))
+        for interface, chosen_candidate in requirements_mapping.items():
+            if interface not in requires:
+                problems.append(ConfigurationProblem(UNUSED_MAPPING,
+                    'Component {} maps {} to {}, but does not require it. '.format(name, interface, chosen_candidate),
+                    name, interface, [chosen_candidate]))
+        if registry.is_fork_safe(name):
+            for required_component in required_components:
+                if not registry.is_fork_safe(required_component):
+                    problems.append(ConfigurationProblem(FORK_UNSAFE_DEPENDENCY,
+                        'Component {} is fork-safe, but depends on {} which is not. '.format(name, required_component),
+                        name, candidates=[required_component]))
+    for members in find_cycles(names, dependencies):
+        problems.append(ConfigurationProblem(CYCLE, 'Cycled dependencies: {}. '.format(', '.join(members)), members=members))
+    return ValidationResult(problems)
+
+
+def find_cycles(names, dependencies):
+    """ Returns lists of names forming dependency cycles (strongly connected components, Tarjan's algorithm), in O(N + E). """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    cycles = []
+    counter = 0
+    for root in names:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(dependencies[root]))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(dependencies[child])))
+                    break
+                if child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    members = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        members.append(member)
+                        if member == node:
+                            break
+                    if len(members) > 1 or node in dependencies[node]:
+                        cycles.append(list(reversed(members)))
+    return cycles
@@ -0,0 +1,51 @@
+""" Shows how requirement resolution scales with registry size, not collected as a test.
+
+Builds registries with one component per tenant shard (every shard requires a shared database and cache 
+and its own shard config), then measures `ComponentFactoryRegistry.resolve` per edge, full `compile()` 
+and `compile()` after registering one more component (incremental). 
+
+Resolution is measured twice: repeatedly for a fixed sample of shards spread over the registry 
+(cost of the lookup itself, flat with registry size), and once for all shards 
+(grows slowly with size as a larger registry fits worse in CPU caches). 
+
+Run from the repository root: PYTHONPATH=src python -m tests.benchmark_registry_lookup [size ...]
+"""
+import sys
+import timeit
+from modulr.application import ComponentFactoryRegistry, ComponentFactory, Constraints, ConfiguredComponentFactory
+
+
+# shards resolved repeatedly to measure the lookup itself
+SAMPLE_SIZE = 1000
+
+
+def create_registry(size):
+    cfr = ComponentFactoryRegistry()
+    cfr.register(ConfiguredComponentFactory('database', ComponentFactory(None, Constraints(['database'], [])), None))
+    cfr.register(ConfiguredComponentFactory('cache', ComponentFactory(None, Constraints(['cache'], [])), None))
+    for i in range(size):
+        shard_config = 'shard_config_{}'.format(i)
+        cfr.register(ConfiguredComponentFactory(shard_config, ComponentFactory(None, Constraints([shard_config, 'shard_config'], [])), None))
+        requires = ['database', 'cache', shard_config, 'shard_config']
+        cfr.register(ConfiguredComponentFactory('shard_{}'.format(i), ComponentFactory(None, Constraints(['shard_{}'.format(i)], requires)), None, 
+            {'shard_config': shard_config}))
+    return cfr
+
+
+def main(sizes):
+    print('{:>8} {:>8} {:>16} {:>18} {:>12} {:>12}'.format('shards', 'edges', 'resolve/edge us', 'full pass/edge us', 'compile s', 'recompile s'))
+    for size in sizes:
+        cfr = create_registry(size)
+        factories = [cfr.get_by_name('shard_{}'.format(i)) for i in range(size)]
+        sample = factories[::max(1, size // SAMPLE_SIZE)]
+        resolve_time = min(timeit.repeat(lambda: [factory.get_injections(cfr) for factory in sample], number=20, repeat=5)) / 20
+        full_pass_time = min(timeit.repeat(lambda: [factory.get_injections(cfr) for factory in factories], number=1, repeat=3))
+        compile_time = timeit.timeit(cfr.compile, number=1)
+        extra = ConfiguredComponentFactory('extra', ComponentFactory(None, Constraints(['extra'], ['database', 'shard_0'])), None)
+        recompile_time = timeit.timeit(lambda: cfr.register(extra) or cfr.compile(), number=1)
+        print('{:>8} {:>8} {:>16.3f} {:>18.3f} {:>12.3f} {:>12.4f}'.format(
+            size, 4 * size, resolve_time / (4 * len(sample)) * 1e6, full_pass_time / (4 * size) * 1e6, compile_time, recompile_time))
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or [1000, 10000, 50000])
@@ -1,7 +1,17 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import subprocess
+import threading
+import time
 import unittest
-from mock import sentinel, Mock
+from concurrent.futures import ThreadPoolExecutor
+from mock import sentinel, Mock, patch
 from modulr.application import ComponentFactoryRegistry, Application, simple_component_factory,\
-    WrongConfigurationError, ConfiguredComponentFactory
+    WrongConfigurationError, ConfiguredComponentFactory, InitializationError,\
+    LazyComponent
 from .helpers import SimilarTo
 
 _sentinel = object()
@@ -224,3 +234,839 @@ class ApplicationTest(unittest.TestCase):
         app = Application({}, cfr)
         with self.assertRaises(WrongConfigurationError):
             app.start()
+
+
+class ParallelStartTest(unittest.TestCase):
+
+    def test_one_depend(self):
+        dependant_component_instance = Component()
+        def dependant_component():
+            return dependant_component_instance
+        depending_component_instance = Component()
+        depending_component_calls = []
+        def depending_component(dependant):
+            depending_component_calls.append(dependant)
+            return depending_component_instance
+        def independent_component():
+            return Component()
+
+        cfr = ComponentFactoryRegistry()
+        cfr.register(ConfiguredComponentFactory('dependant_component_name', simple_component_factory(dependant_component, ['dependant']), sentinel.config))
+        cfr.register(ConfiguredComponentFactory('depending_component_name', simple_component_factory(depending_component, ['depending']), sentinel.config))
+        cfr.register(ConfiguredComponentFactory('independent_component_name', simple_component_factory(independent_component, ['independent']), sentinel.config))
+        app = Application({}, cfr)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            app.start(executor=executor)
+        self.assertListEqual(depending_component_calls, [dependant_component_instance])
+        self.assertEquals(1, dependant_component_instance.inited)
+        self.assertEquals(1, depending_component_instance.inited)
+        self.assertListEqual(sorted(app._components.keys()), ['dependant_component_name', 'depending_component_name', 'independent_component_name'])
+
+    def test_factory_error(self):
+        def component():
+            raise ValueError()
+        cfr = ComponentFactoryRegistry()
+        cfr.register(ConfiguredComponentFactory('component_name', simple_component_factory(component, ['component_interface']), sentinel.config))
+        app = Application({}, cfr)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            with self.assertRaises(ValueError):
+                app.start(executor=executor)
+
+    def test_init_order(self):
+        inited = []
+        class OrderedComponent(object):
+            def __init__(self, name):
+                self.name = name
+            def init(self):
+                inited.append(self.name)
+        def a():
+            return OrderedComponent('a')
+        def b(a_interface):
+            return OrderedComponent('b')
+        def c(a_interface):
+            return OrderedComponent('c')
+        def d(b_interface, c_interface):
+            return OrderedComponent('d')
+
+        cfr = ComponentFactoryRegistry()
+        for name, function in [('a', a), ('b', b), ('c', c), ('d', d)]:
+            cfr.register(ConfiguredComponentFactory(name, simple_component_factory(function, [name + '_interface']), sentinel.config))
+        app = Application({}, cfr)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            app.start(executor=executor)
+        self.assertEqual(inited[0], 'd')
+        self.assertListEqual(sorted(inited[1:3]), ['b', 'c'])
+        self.assertEqual(inited[3], 'a')
+
+    def test_init_errors_collected(self):
+        class FailingComponent(object):
+            def init(self):
+                raise ValueError()
+        base_component_instance = Component()
+        def base():
+            return base_component_instance
+        def failing1(base_interface):
+            return FailingComponent()
+        def failing2(base_interface):
+            return FailingComponent()
+
+        cfr = ComponentFactoryRegistry()
+        for name, function in [('base', base), ('failing1', failing1), ('failing2', failing2)]:
+            cfr.register(ConfiguredComponentFactory(name, simple_component_factory(function, [name + '_interface']), sentinel.config))
+        app = Application({}, cfr)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            with self.assertRaises(InitializationError) as cm:
+                app.start(executor=executor)
+        self.assertListEqual(sorted(cm.exception.errors.keys()), ['failing1', 'failing2'])
+        self.assertEquals(0, base_component_instance.inited)
+
+
+class AsyncStartTest(unittest.TestCase):
+
+    def _run(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(asyncio.wait_for(coroutine, 5))
+        finally:
+            loop.close()
+
+    def test_coroutine_factories_and_init(self):
+        class AsyncComponent(object):
+            def __init__(self):
+                self.inited = 0
+            async def init(self):
+                await asyncio.sleep(0)
+                self.inited += 1
+        dependant_component_instance = AsyncComponent()
+        async def dependant_component():
+            await asyncio.sleep(0)
+            return dependant_component_instance
+        depending_component_instance = Component()
+        depending_component_calls = []
+        def depending_component(dependant):
+            depending_component_calls.append(dependant)
+            return depending_component_instance
+
+        cfr = ComponentFactoryRegistry()
+        cfr.register(ConfiguredComponentFactory('dependant_component_name', simple_component_factory(dependant_component, ['dependant']), sentinel.config))
+        cfr.register(ConfiguredComponentFactory('depending_component_name', simple_component_factory(depending_component, ['depending']), sentinel.config))
+        app = Application({}, cfr)
+        self._run(app.start_async())
+        self.assertListEqual(depending_component_calls, [dependant_component_instance])
+        self.assertEquals(1, dependant_component_instance.inited)
+        self.assertEquals(1, depending_component_instance.inited)
+
+    def test_started_components_kept(self):
+        calls = []
+        def a():
+            calls.append('a')
+            return Component()
+        def b(a_interface):
+            calls.append('b')
+            return Component()
+        cfr = ComponentFactoryRegistry()
+        for function in [a, b]:
+            cfr.register(ConfiguredComponentFactory(function.__name__, simple_component_factory(function, [function.__name__ + '_interface']), sentinel.config))
+        app = Application({}, cfr)
+        app.start(targets=['a_interface'])
+        started = app._components['a']
+        self._run(app.start_async())
+        self.assertListEqual(calls, ['a', 'b'])
+        self.assertIs(app._components['a'], started)
+        self.assertEquals(1, started.inited)
+        self.assertEquals(1, app._components['b'].inited)
+
+    def test_independent_components_overlap(self):
+        events = {}
+        async def first():
+            events['first'] = asyncio.Event()
+            events['first'].set()
+            await events.setdefault('second', asyncio.Event()).wait()
+            return Component()
+        async def second():
+            events.setdefault('second', asyncio.Event()).set()
+            await events['first'].wait()
+            return Component()
+
+        cfr = ComponentFactoryRegistry()
+        cfr.register(ConfiguredComponentFactory('first', simple_component_factory(first, ['first_interface']), sentinel.config))
+        cfr.register(ConfiguredComponentFactory('second', simple_component_factory(second, ['second_interface']), sentinel.config))
+        app = Application({}, cfr)
+        self._run(app.start_async())
+        self.assertListEqual(sorted(app._components.keys()), ['first', 'second'])
+
+    def test_init_errors_collected(self):
+        class FailingComponent(object):
+            async def init(self):
+                raise ValueError()
+        def failing1():
+            return FailingComponent()
+        def failing2():
+            return FailingComponent()
+
+        cfr = ComponentFactoryRegistry()
+        cfr.register(ConfiguredComponentFactory('failing1', simple_component_factory(failing1, ['failing1_interface']), sentinel.config))
+        cfr.register(ConfiguredComponentFactory('failing2', simple_component_factory(failing2, ['failing2_interface']), sentinel.config))
+        app = Application({}, cfr)
+        with self.assertRaises(InitializationError) as cm:
+            self._run(app.start_async())
+        self.assertListEqual(sorted(cm.exception.errors.keys()), ['failing1', 'failing2'])
+
+    def test_init_cancelled(self):
+        class CancelledComponent(object):
+            async def init(self):
+                raise asyncio.CancelledError()
+        def cancelled():
+            return CancelledComponent()
+
+        cfr = ComponentFactoryRegistry()
+        cfr.register(ConfiguredComponentFactory('cancelled', simple_component_factory(cancelled, ['cancelled_interface']), sentinel.config))
+        app = Application({}, cfr)
+        with self.assertRaises(asyncio.CancelledError):
+            self._run(app.start_async())
+
+
+class LazyStartTest(unittest.TestCase):
+
+    def _create_registry(self, lazy_registry, lazy):
+        self.lazy_component_calls = []
+        self.lazy_component_instance = Component()
+        self.lazy_component_instance.value = sentinel.value
+        def lazy_component():
+            self.lazy_component_calls.append(None)
+            return self.lazy_component_instance
+        self.depending_component_calls = []
+        def depending_component(lazy_interface):
+            self.depending_component_calls.append(lazy_interface)
+            return Component()
+
+        cfr = ComponentFactoryRegistry(lazy=lazy_registry)
+        cfr.register(ConfiguredComponentFactory('lazy_component_name', simple_component_factory(lazy_component, ['lazy_interface']), sentinel.config, lazy=lazy))
+        cfr.register(ConfiguredComponentFactory('depending_component_name', simple_component_factory(depending_component, ['depending']), sentinel.config, lazy=False))
+        return cfr
+
+    def test_lazy_component(self):
+        app = Application({}, self._create_registry(False, True))
+        app.start()
+        self.assertEquals(0, len(self.lazy_component_calls))
+        proxy = self.depending_component_calls[0]
+        self.assertIsInstance(proxy, LazyComponent)
+        self.assertFalse(proxy.is_loaded())
+        self.assertEquals(sentinel.value, proxy.value)
+        self.assertEquals(sentinel.value, proxy.value)
+        self.assertTrue(proxy.is_loaded())
+        self.assertEquals(1, len(self.lazy_component_calls))
+        self.assertEquals(1, self.lazy_component_instance.inited)
+
+    def test_registry_default(self):
+        app = Application({}, self._create_registry(True, None))
+        app.start()
+        self.assertEquals(0, len(self.lazy_component_calls))
+        self.assertIsInstance(self.depending_component_calls[0], LazyComponent)
+
+    def test_eager_override(self):
+        app = Application({}, self._create_registry(True, False))
+        app.start()
+        self.assertListEqual(self.depending_component_calls, [self.lazy_component_instance])
+        self.assertEquals(1, self.lazy_component_instance.inited)
+
+    def test_concurrent_first_use(self):
+        app = Application({}, self._create_registry(False, True))
+        app.start()
+        proxy = self.depending_component_calls[0]
+        threads = [threading.Thread(target=lambda: proxy.value) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(1, len(self.lazy_component_calls))
+        self.assertEquals(1, self.lazy_component_instance.inited)
+
+    def test_special_methods_forwarded(self):
+        class CallableComponent(Component):
+            def __call__(self, value):
+                return [value]
+            def __iter__(self):
+                return iter([1, 2])
+            def __enter__(self):
+                return sentinel.entered
+            def __exit__(self, exc_type, exc_value, traceback):
+                return False
+        app = Application({}, self._create_registry(False, True))
+        self.lazy_component_instance = instance = CallableComponent()
+        app.start()
+        proxy = self.depending_component_calls[0]
+        self.assertFalse(proxy.is_loaded())
+        self.assertIsInstance(proxy, LazyComponent)
+        self.assertIsInstance(proxy, CallableComponent)
+        self.assertListEqual(proxy(sentinel.value), [sentinel.value])
+        self.assertListEqual(list(proxy), [1, 2])
+        with proxy as entered:
+            self.assertIs(entered, sentinel.entered)
+        self.assertTrue(proxy == instance)
+        self.assertEquals(1, len(self.lazy_component_calls))
+
+    def test_async_start_does_not_load(self):
+        app = Application({}, self._create_registry(False, True))
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(app.start_async())
+        finally:
+            loop.close()
+        self.assertEquals(0, len(self.lazy_component_calls))
+        self.assertFalse(self.depending_component_calls[0].is_loaded())
+
+
+class StartupPlanTest(unittest.TestCase):
+
+    def _create_registry(self):
+        def dependant_component():
+            return Component()
+        def depending_component(dependant):
+            return Component()
+        cfr = ComponentFactoryRegistry()
+        cfr.register(ConfiguredComponentFactory('dependant_component_name', simple_component_factory(dependant_component, ['dependant']), sentinel.config))
+        cfr.register(ConfiguredComponentFactory('depending_component_name', simple_component_factory(depending_component, ['depending']), sentinel.config))
+        return cfr
+
+    def test_compile(self):
+        plan = self._create_registry().compile()
+        self.assertEqual(plan.get_order(), ('dependant_component_name', 'depending_component_name'))
+        self.assertEqual(plan.get_levels(), (('dependant_component_name',), ('depending_component_name',)))
+        self.assertEqual(dict(plan.get_injections('depending_component_name')), {'dependant': 'dependant_component_name'})
+        self.assertEqual(dict(plan.get_injections('dependant_component_name')), {})
+        with self.assertRaises(TypeError):
+            plan.get_injections('depending_component_name')['dependant'] = 'other'
+
+    def test_compile_cached_until_register(self):
+        cfr = self._create_registry()
+        plan = cfr.compile()
+        self.assertIs(plan, cfr.compile())
+        cfr.register(ConfiguredComponentFactory('other_component_name', simple_component_factory(lambda: Component(), ['other']), sentinel.config))
+        self.assertIsNot(plan, cfr.compile())
+        self.assertEqual(len(cfr.compile().get_order()), 3)
+
+    def test_start_with_plan(self):
+        cfr = self._create_registry()
+        plan = cfr.compile()
+        cfr.compile = Mock(side_effect=AssertionError('plan should be reused'))
+        for i in range(2):
+            app = Application({}, cfr)
+            app.start(plan=plan)
+            self.assertListEqual(sorted(app._components.keys()), ['dependant_component_name', 'depending_component_name'])
+
+
+class RegistryUpdatesTest(unittest.TestCase):
+
+    def _register(self, cfr, name, function, implements, requirements_mapping=None):
+        cfr.register(ConfiguredComponentFactory(name, simple_component_factory(function, implements), sentinel.config, requirements_mapping))
+
+    def test_unregister(self):
+        cfr = ComponentFactoryRegistry()
+        self._register(cfr, 'a', lambda: Component(), ['a_interface'])
+        self._register(cfr, 'b', lambda a_interface: Component(), ['b_interface'])
+        self.assertEqual(cfr.compile().get_order(), ('a', 'b'))
+        cfr.unregister('b')
+        self.assertEqual(cfr.compile().get_order(), ('a',))
+        self.assertListEqual(cfr.get_by_implements('b_interface'), [])
+        cfr.unregister('a')
+        self.assertEqual(cfr.compile().get_order(), ())
+
+    def test_unregister_provider(self):
+        cfr = ComponentFactoryRegistry()
+        self._register(cfr, 'a', lambda: Component(), ['a_interface'])
+        self._register(cfr, 'b', lambda a_interface: Component(), ['b_interface'])
+        cfr.compile()
+        cfr.unregister('a')
+        with self.assertRaises(WrongConfigurationError):
+            cfr.compile()
+        self._register(cfr, 'a2', lambda: Component(), ['a_interface'])
+        self.assertEqual(cfr.compile().get_order(), ('a2', 'b'))
+
+    def test_register_after_compile(self):
+        cfr = ComponentFactoryRegistry()
+        self._register(cfr, 'b', lambda a_interface: Component(), ['b_interface'])
+        self._register(cfr, 'c', lambda b_interface: Component(), ['c_interface'])
+        with self.assertRaises(WrongConfigurationError):
+            cfr.compile()
+        self._register(cfr, 'a', lambda: Component(), ['a_interface'])
+        plan = cfr.compile()
+        self.assertEqual(plan.get_order(), ('a', 'b', 'c'))
+        self.assertEqual(plan.get_levels(), (('a',), ('b',), ('c',)))
+        self._register(cfr, 'a_other', lambda: Component(), ['a_interface'])
+        with self.assertRaises(WrongConfigurationError):
+            cfr.compile()
+        self._register(cfr, 'b', lambda a_interface: Component(), ['b_interface'], {'a_interface': 'a_other'})
+        self.assertEqual(dict(cfr.compile().get_injections('b')), {'a_interface': 'a_other'})
+
+    def test_cycle_removed_by_unregister(self):
+        cfr = ComponentFactoryRegistry()
+        self._register(cfr, 'a', lambda c_interface: Component(), ['a_interface'])
+        self._register(cfr, 'b', lambda a_interface: Component(), ['b_interface'])
+        self._register(cfr, 'c', lambda b_interface: Component(), ['c_interface'])
+        with self.assertRaises(WrongConfigurationError):
+            cfr.compile()
+        self._register(cfr, 'a', lambda: Component(), ['a_interface'])
+        self.assertEqual(cfr.compile().get_order(), ('a', 'b', 'c'))
+
+
+class ReconfigureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        def a(context):
+            self.calls.append('a')
+            return Component()
+        def b(a_interface):
+            self.calls.append('b')
+            return Component()
+        def c():
+            self.calls.append('c')
+            return Component()
+        self.factories = dict((function.__name__, simple_component_factory(function, [function.__name__ + '_interface'])) for function in [a, b, c])
+
+    def _create_registry(self, configs):
+        cfr = ComponentFactoryRegistry()
+        for name, config in sorted(configs.items()):
+            cfr.register(ConfiguredComponentFactory(name, self.factories[name], config))
+        return cfr
+
+    def test_rebuild_changed_and_dependants(self):
+        app = Application({}, self._create_registry({'a': 1, 'b': 1, 'c': 1}))
+        app.start()
+        components = dict(app._components)
+        del self.calls[:]
+        rebuilt = app.reconfigure(self._create_registry({'a': 2, 'b': 1, 'c': 1}))
+        self.assertListEqual(rebuilt, ['a', 'b'])
+        self.assertListEqual(self.calls, ['a', 'b'])
+        self.assertIs(components['c'], app._components['c'])
+        self.assertIsNot(components['a'], app._components['a'])
+        self.assertEquals(1, app._components['a'].inited)
+        self.assertEquals(1, components['c'].inited)
+
+    def test_unchanged(self):
+        app = Application({}, self._create_registry({'a': 1, 'b': 1, 'c': 1}))
+        app.start()
+        del self.calls[:]
+        self.assertListEqual(app.reconfigure(self._create_registry({'a': 1, 'b': 1, 'c': 1})), [])
+        self.assertListEqual(self.calls, [])
+
+    def test_added_and_removed(self):
+        app = Application({}, self._create_registry({'a': 1, 'b': 1}))
+        app.start()
+        del self.calls[:]
+        self.assertListEqual(app.reconfigure(self._create_registry({'a': 1, 'c': 1})), ['c'])
+        self.assertListEqual(sorted(app._components.keys()), ['a', 'c'])
+
+    def test_not_started(self):
+        app = Application({}, self._create_registry({'a': 1}))
+        self.assertListEqual(app.reconfigure(self._create_registry({'a': 1, 'b': 1})), ['a', 'b'])
+
+    def test_new_factory_objects_of_same_functions(self):
+        functions = dict((name, factory.get_function()) for name, factory in self.factories.items())
+        app = Application({}, self._create_registry({'a': 1, 'b': 1}))
+        app.start()
+        self.factories = dict((name, simple_component_factory(function, [name + '_interface'])) for name, function in functions.items())
+        self.assertListEqual(app.reconfigure(self._create_registry({'a': 1, 'b': 1})), [])
+
+    def test_failed_creation(self):
+        app = Application({}, self._create_registry({'a': 1, 'b': 1}))
+        app.start()
+        components = dict(app._components)
+        components['a'].stop = Mock()
+        def failing_b(a_interface):
+            if failures:
+                raise failures.pop()
+            return Component()
+        failures = [ValueError()]
+        self.factories['b'] = simple_component_factory(failing_b, ['b_interface'])
+        with self.assertRaises(ValueError):
+            app.reconfigure(self._create_registry({'a': 2, 'b': 1}))
+        components['a'].stop.assert_called_once_with()
+        self.assertListEqual(list(app._components.keys()), [])
+        app.start()
+        self.assertListEqual(sorted(app._components.keys()), ['a', 'b'])
+        self.assertEquals(1, app._components['b'].inited)
+
+
+class StopTest(unittest.TestCase):
+
+    def _start(self, stops):
+        """ Starts application a <- b, a <- c with given stop functions. """
+        self.stopped = []
+        def create_component(name):
+            component = Component()
+            def stop():
+                stops.get(name, lambda: None)()
+                self.stopped.append(name)
+            component.stop = stop
+            return component
+        def a():
+            return create_component('a')
+        def b(a_interface):
+            return create_component('b')
+        def c(a_interface):
+            return create_component('c')
+        cfr = ComponentFactoryRegistry()
+        for function in [a, b, c]:
+            cfr.register(ConfiguredComponentFactory(function.__name__, simple_component_factory(function, [function.__name__ + '_interface']), sentinel.config))
+        app = Application({}, cfr)
+        app.start()
+        return app
+
+    def test_order_and_concurrency(self):
+        b_stopping = threading.Event()
+        c_stopping = threading.Event()
+        def stop_b():
+            b_stopping.set()
+            self.assertTrue(c_stopping.wait(5))
+        def stop_c():
+            c_stopping.set()
+            self.assertTrue(b_stopping.wait(5))
+        app = self._start({'b': stop_b, 'c': stop_c})
+        report = app.stop()
+        self.assertTrue(report.is_clean())
+        self.assertListEqual(sorted(report.stopped[:2]), ['b', 'c'])
+        self.assertEqual(report.stopped[2], 'a')
+        self.assertEqual(self.stopped[2], 'a')
+        self.assertEqual(app._components, {})
+
+    def test_component_timeout_and_failure(self):
+        release = threading.Event()
+        def stop_c():
+            raise ValueError()
+        app = self._start({'b': lambda: release.wait(5), 'c': stop_c})
+        try:
+            report = app.stop(component_timeout=0.05)
+        finally:
+            release.set()
+        self.assertListEqual(report.timed_out, ['b'])
+        self.assertListEqual(list(report.failed.keys()), ['c'])
+        self.assertListEqual(report.stopped, ['a'])
+
+    def test_global_timeout(self):
+        release = threading.Event()
+        app = self._start({'b': lambda: release.wait(5)})
+        try:
+            report = app.stop(timeout=0.05)
+        finally:
+            release.set()
+        self.assertListEqual(report.timed_out, ['b'])
+        self.assertListEqual(report.stopped, ['c'])
+        self.assertListEqual(report.skipped, ['a'])
+
+    def test_not_started(self):
+        app = Application({}, ComponentFactoryRegistry())
+        self.assertTrue(app.stop().is_clean())
+
+    def test_hung_stop_does_not_delay_exit(self):
+        script = '\n'.join([
+            'import threading',
+            'from modulr.application import Application, ComponentFactoryRegistry, ConfiguredComponentFactory, simple_component_factory',
+            'class Hung(object):',
+            '    def init(self):',
+            '        pass',
+            '    def stop(self):',
+            '        threading.Event().wait(30)',
+            'cfr = ComponentFactoryRegistry()',
+            'cfr.register(ConfiguredComponentFactory("hung", simple_component_factory(Hung, ["hung"]), None))',
+            'app = Application({}, cfr)',
+            'app.start()',
+            'assert app.stop(timeout=0.1).timed_out == ["hung"]',
+        ])
+        started = time.monotonic()
+        subprocess.check_call([sys.executable, '-c', script], timeout=20)
+        self.assertLess(time.monotonic() - started, 10)
+
+    def test_threads_limited(self):
+        threads = set()
+        def stop():
+            threads.add(threading.current_thread().name)
+            time.sleep(0.001)
+        def create():
+            component = Component()
+            component.stop = stop
+            return component
+        cfr = ComponentFactoryRegistry()
+        for i in range(100):
+            cfr.register(ConfiguredComponentFactory('c{}'.format(i), simple_component_factory(create, ['c{}'.format(i)]), None))
+        app = Application({}, cfr)
+        app.start()
+        report = app.stop()
+        self.assertEqual(len(report.stopped), 100)
+        self.assertLessEqual(len(threads), 32)
+
+    def test_queued_stop_runs_after_hung_one(self):
+        release = threading.Event()
+        with patch('modulr.application._MAX_STOP_WORKERS', 1):
+            app = self._start({'b': lambda: release.wait(5), 'c': lambda: release.wait(5)})
+            try:
+                report = app.stop(component_timeout=0.05)
+            finally:
+                release.set()
+        self.assertListEqual(sorted(report.timed_out), ['b', 'c'])
+        self.assertListEqual(report.skipped, [])
+        self.assertListEqual(report.stopped, ['a'])
+
+    def test_component_timeout_counted_from_call_start(self):
+        with patch('modulr.application._MAX_STOP_WORKERS', 1):
+            app = self._start({'b': lambda: time.sleep(0.1), 'c': lambda: time.sleep(0.1)})
+            report = app.stop(component_timeout=0.15)
+        self.assertTrue(report.is_clean())
+        self.assertListEqual(sorted(report.stopped), ['a', 'b', 'c'])
+
+    def test_coroutine_stop_awaited(self):
+        stopped = []
+        class AsyncStopped(Component):
+            async def stop(self):
+                await asyncio.sleep(0)
+                stopped.append(self)
+        cfr = ComponentFactoryRegistry()
+        cfr.register(ConfiguredComponentFactory('a', simple_component_factory(AsyncStopped, ['a_interface']), None))
+        app = Application({}, cfr)
+        app.start()
+        component = app._components['a']
+        report = app.stop()
+        self.assertListEqual(report.stopped, ['a'])
+        self.assertListEqual(stopped, [component])
+
+    def test_reconfigure_stops_dropped(self):
+        app = self._start({})
+        cfr = ComponentFactoryRegistry()
+        cfr.register(ConfiguredComponentFactory('a', app._plan.get_factory('a').get_component_factory(), sentinel.config))
+        app.reconfigure(cfr)
+        self.assertListEqual(sorted(self.stopped), ['b', 'c'])
+
+
+class PreforkTest(unittest.TestCase):
+
+    def _create_registry(self, unsafe_table=False):
+        self.calls = []
+        def table():
+            self.calls.append('table')
+            return Component()
+        def socket(table_interface):
+            self.calls.append('socket')
+            return Component()
+        def router(table_interface):
+            self.calls.append('router')
+            return Component()
+        cfr = ComponentFactoryRegistry()
+        cfr.register(ConfiguredComponentFactory('table', simple_component_factory(table, ['table_interface']), sentinel.config, fork_safe=not unsafe_table))
+        cfr.register(ConfiguredComponentFactory('router', simple_component_factory(router, ['router_interface']), sentinel.config, fork_safe=True))
+        cfr.register(ConfiguredComponentFactory('socket', simple_component_factory(socket, ['socket_interface']), sentinel.config))
+        return cfr
+
+    def test_start_shared_then_rest(self):
+        app = Application({}, self._create_registry())
+        app.start_shared()
+        self.assertListEqual(sorted(app._components.keys()), ['router', 'table'])
+        table = app._components['table']
+        self.assertEquals(1, table.inited)
+        app.start()
+        self.assertListEqual(sorted(self.calls), ['router', 'socket', 'table'])
+        self.assertIs(table, app._components['table'])
+        self.assertEquals(1, table.inited)
+        self.assertEquals(1, app._components['socket'].inited)
+
+    def test_reconfigure_after_start_shared(self):
+        cfr = self._create_registry()
+        app = Application({}, cfr)
+        app.start_shared()
+        table = cfr.get_by_name('table')
+        cfr.register(ConfiguredComponentFactory('table', table.get_component_factory(), sentinel.other_config, fork_safe=True))
+        del self.calls[:]
+        self.assertListEqual(app.reconfigure(cfr), ['table', 'router'])
+        self.assertListEqual(self.calls, ['table', 'router'])
+        self.assertListEqual(sorted(app._components.keys()), ['router', 'table'])
+        self.assertTrue(app.stop().is_clean())
+
+    def test_fork_safe_depends_on_unsafe(self):
+        app = Application({}, self._create_registry(unsafe_table=True))
+        with self.assertRaises(WrongConfigurationError):
+            app.start_shared()
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+    def test_start_prefork(self):
+        directory = tempfile.mkdtemp()
+        try:
+            app = Application({}, self._create_registry())
+            def worker_main(worker_app):
+                with open(os.path.join(directory, str(os.getpid())), 'w') as f:
+                    f.write(','.join(sorted(self.calls)))
+            pids = app.start_prefork(2, worker_main)
+            self.assertEqual(len(pids), 2)
+            for pid in pids:
+                self.assertEqual(os.waitpid(pid, 0)[1], 0)
+                with open(os.path.join(directory, str(pid))) as f:
+                    self.assertEqual(f.read(), 'router,socket,table')
+            self.assertListEqual(sorted(self.calls), ['router', 'table'])
+        finally:
+            shutil.rmtree(directory)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+    def test_worker_output_flushed(self):
+        script = '\n'.join([
+            'import os, sys',
+            'from modulr.application import Application, ComponentFactoryRegistry',
+            'def worker_main(app):',
+            '    print("worker output")',
+            '    raise ValueError("worker failure")',
+            'sys.stdout.flush()',
+            'for pid in Application({}, ComponentFactoryRegistry()).start_prefork(1, worker_main):',
+            '    assert os.waitpid(pid, 0)[1] != 0',
+        ])
+        env = dict((key, value) for key, value in os.environ.items() if key != 'PYTHONUNBUFFERED')
+        result = subprocess.run([sys.executable, '-c', script], stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, timeout=20)
+        self.assertEqual(result.returncode, 0)
+        self.assertIn(b'worker output', result.stdout)
+        self.assertIn(b'worker failure', result.stderr)
+
+
+class TargetsStartTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        def a():
+            self.calls.append('a')
+            return Component()
+        def b(a_interface):
+            self.calls.append('b')
+            return Component()
+        def c():
+            self.calls.append('c')
+            return Component()
+        self.cfr = ComponentFactoryRegistry()
+        for function in [a, b, c]:
+            self.cfr.register(ConfiguredComponentFactory(function.__name__, simple_component_factory(function, [function.__name__ + '_interface']), {}))
+        self.app = Application({}, self.cfr)
+
+    def test_closure(self):
+        self.app.start(targets=['b_interface'])
+        self.assertListEqual(self.calls, ['a', 'b'])
+        self.assertListEqual(sorted(self.app._components.keys()), ['a', 'b'])
+        self.assertEquals(1, self.app._components['a'].inited)
+        self.app.start()
+        self.assertListEqual(self.calls, ['a', 'b', 'c'])
+
+    def test_parallel(self):
+        with ThreadPoolExecutor(2) as executor:
+            self.app.start(executor, targets=['a_interface'])
+        self.assertListEqual(self.calls, ['a'])
+
+    def test_missing_target(self):
+        with self.assertRaises(WrongConfigurationError):
+            self.app.start(targets=['no_such_interface'])
+
+    def test_script(self):
+        script = Mock(return_value=sentinel.output)
+        self.app.get_scripts_manager().register('script', script, requires=['b_interface'])
+        self.assertIs(self.app.run_script_from_args(['script', sentinel.arg]), sentinel.output)
+        self.assertListEqual(sorted(self.app._components.keys()), ['a', 'b'])
+        script.assert_called_once_with([sentinel.arg], b_interface=self.app._components['b'])
+
+    def test_script_without_requires(self):
+        script = Mock(return_value=sentinel.output)
+        self.app.get_scripts_manager().register('script', script)
+        self.assertIs(self.app.run_script_from_args(['script']), sentinel.output)
+        self.assertListEqual(self.calls, [])
+        script.assert_called_once_with([])
+
+    def test_script_registered_by_component(self):
+        script = Mock(return_value=sentinel.output)
+        def d(context):
+            context.scripts_manager.register('script', script)
+            return Component()
+        self.cfr.register(ConfiguredComponentFactory('d', simple_component_factory(d, ['d_interface']), {}))
+        app = Application({}, self.cfr, script_loader=Application.start)
+        self.assertIs(app.run_script_from_args(['script']), sentinel.output)
+        self.assertListEqual(sorted(app._components.keys()), ['a', 'b', 'c', 'd'])
+
+    def test_unknown_script(self):
+        with self.assertRaises(ValueError):
+            self.app.run_script_from_args(['no-such-script'])
+        self.assertListEqual(self.calls, [])
+
+    def test_reconfigure_changed_dependency(self):
+        self.app.start(targets=['b_interface'])
+        def a2():
+            self.calls.append('a2')
+            return Component()
+        cfr = ComponentFactoryRegistry()
+        cfr.register(ConfiguredComponentFactory('a', simple_component_factory(a2, ['a_interface']), {}))
+        for name in ['b', 'c']:
+            cfr.register(self.cfr.get_by_name(name))
+        self.assertListEqual(self.app.reconfigure(cfr), ['a', 'b'])
+        self.assertListEqual(self.calls, ['a', 'b', 'a2', 'b'])
+        self.assertListEqual(sorted(self.app._components.keys()), ['a', 'b'])
+
+    def test_stop_after_partial_start(self):
+        self.app.start(targets=['a_interface'])
+        self.app._components['a'].stop = Mock()
+        report = self.app.stop()
+        self.assertListEqual(report.stopped, ['a'])
+        self.assertListEqual(report.skipped, [])
+        self.assertDictEqual(self.app._components, {})
+
+
+class LoadFromConfigTest(unittest.TestCase):
+
+    module_name = 'modulr_test_loaded_components'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(self.directory, self.module_name + '.py'), 'w') as f:
+            f.write('''
+class Component(object):
+    def __init__(self, **dependencies):
+        self.dependencies = dependencies
+    def init(self):
+        pass
+
+def database(context):
+    return Component(config=context.config)
+
+def repository(database):
+    return Component(database=database)
+''')
+        sys.path.insert(0, self.directory)
+
+    def tearDown(self):
+        sys.path.remove(self.directory)
+        sys.modules.pop(self.module_name, None)
+        shutil.rmtree(self.directory)
+
+    def _get_config(self):
+        return {
+            'database': {'factory': self.module_name + ':database', 'implements': ['database'], 'requires': [], 'config': sentinel.database_config},
+            'repository': {'factory': self.module_name + ':repository', 'implements': ['repository'], 'requires': ['database'], 'lazy': True},
+        }
+
+    def test_import_on_create(self):
+        cfr = ComponentFactoryRegistry()
+        cfr.load_from_config(self._get_config())
+        plan = cfr.compile()
+        self.assertEqual(plan.get_order(), ('database', 'repository'))
+        self.assertNotIn(self.module_name, sys.modules)
+        app = Application({}, cfr)
+        app.start()
+        database = app._components['database']
+        self.assertEqual(database.dependencies, {'config': sentinel.database_config})
+        self.assertIs(app._components['repository'].dependencies['database'], database)
+
+    def test_requires_from_function(self):
+        config = self._get_config()
+        del config['repository']['requires']
+        cfr = ComponentFactoryRegistry()
+        cfr.load_from_config(config)
+        self.assertIn(self.module_name, sys.modules)
+        self.assertEqual(dict(cfr.compile().get_injections('repository')), {'database': 'database'})
+
+    def test_reconfigure_same_config(self):
+        cfr = ComponentFactoryRegistry()
+        cfr.load_from_config(self._get_config())
+        app = Application({}, cfr)
+        app.start()
+        cfr = ComponentFactoryRegistry()
+        cfr.load_from_config(self._get_config())
+        self.assertListEqual(app.reconfigure(cfr), [])
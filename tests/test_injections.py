@@ -1,6 +1,13 @@
+import asyncio
+import io
+import json
+import threading
+import time
 import unittest
-from mock import sentinel, Mock
-from modulr.injections import Injector, get_injections, InjectorError
+from concurrent.futures import ThreadPoolExecutor
+from mock import sentinel, Mock, patch
+from modulr.injections import Injector, get_injections, InjectorError, APPLICATION_SCOPE, REQUEST_SCOPE, TASK_SCOPE,\
+    get_call_plan, Singleton, PerThread, PerScope, Cached
 
 
 class GetInjectionsTest(unittest.TestCase):
@@ -27,6 +34,40 @@ class GetInjectionsTest(unittest.TestCase):
     def test_kwargs(self):
         self._test(lambda x, y=5, **kwargs: None, ['x', 'y'])
 
+    def test_keyword_only(self):
+        self._test(lambda x, *args, y, z=5: None, ['x', 'y', 'z'])
+
+
+class GetCallPlanTest(unittest.TestCase):
+
+    def test_cached(self):
+        def f(x, y=5, *args, z, **kwargs):
+            pass
+        plan = get_call_plan(f)
+        self.assertIs(plan, get_call_plan(f))
+        self.assertEqual(plan.names, ('x', 'y', 'z'))
+        self.assertEqual(plan.keyword_only, ('z',))
+        self.assertEqual(plan.defaults, {'y': 5})
+
+    def test_bound_method(self):
+        class Handler(object):
+            def handle(self, x, y=5):
+                pass
+        handler = Handler()
+        plan = get_call_plan(handler.handle)
+        self.assertEqual(plan.names, ('x', 'y'))
+        self.assertIs(plan, get_call_plan(Handler().handle))
+        self.assertEqual(get_call_plan(Handler.handle).names, ('self', 'x', 'y'))
+
+    def test_class(self):
+        class Component(object):
+            def __init__(self, x):
+                pass
+        self.assertEqual(get_call_plan(Component).names, ('x',))
+
+    def test_not_weak_referenceable(self):
+        self.assertEqual(get_call_plan(len).names, ())
+
 
 class InjectorTests(unittest.TestCase):
     
@@ -47,3 +88,568 @@ class InjectorTests(unittest.TestCase):
         injector = Injector(data={'x': sentinel.x})
         with self.assertRaises(InjectorError):
             injector.call(lambda x, y: None)
+
+    def test_default(self):
+        self._test(lambda x, y=sentinel.default: [x, y], Injector(data={'x': sentinel.x}), [sentinel.x, sentinel.default])
+        self._test(lambda x, y=sentinel.default: [x, y], Injector(data={'x': sentinel.x, 'y': sentinel.y}), [sentinel.x, sentinel.y])
+
+    def test_keyword_only(self):
+        self._test(lambda *, x: [x], Injector(data={'x': sentinel.x}), [sentinel.x])
+
+    def test_kwargs_not_injected(self):
+        ret = Injector(data={'x': sentinel.x}).call(lambda x, y: [x, y], y=sentinel.y)
+        self.assertEqual(ret, [sentinel.x, sentinel.y])
+
+    def test_method(self):
+        class Handler(object):
+            def handle(self, x):
+                return [self, x]
+        handler = Handler()
+        self._test(handler.handle, Injector(data={'x': sentinel.x}), [handler, sentinel.x])
+
+
+class ScopesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.injector = Injector(data={'database': sentinel.database})
+        def session(database, request):
+            self.calls.append(('session', request))
+            return [database, request]
+        self.injector.register_scoped('session', session, REQUEST_SCOPE)
+
+    def test_request_scope(self):
+        with self.injector.scope(REQUEST_SCOPE, request=sentinel.request1) as request_injector:
+            session = request_injector.get('session')
+            self.assertEqual(session, [sentinel.database, sentinel.request1])
+            self.assertIs(request_injector.get('session'), session)
+            self.assertIs(request_injector.child().get('session'), session)
+        with self.injector.scope(REQUEST_SCOPE, request=sentinel.request2) as request_injector:
+            self.assertEqual(request_injector.get('session'), [sentinel.database, sentinel.request2])
+        self.assertListEqual(self.calls, [('session', sentinel.request1), ('session', sentinel.request2)])
+
+    def test_containers_pooled(self):
+        with self.injector.scope(REQUEST_SCOPE, request=sentinel.request1) as request_injector:
+            pass
+        with self.injector.scope(REQUEST_SCOPE, request=sentinel.request2) as next_request_injector:
+            self.assertIs(next_request_injector, request_injector)
+            self.assertIs(next_request_injector.get('request'), sentinel.request2)
+            with self.injector.scope(REQUEST_SCOPE, request=sentinel.request3) as concurrent_request_injector:
+                self.assertIsNot(concurrent_request_injector, request_injector)
+
+    def test_release_twice(self):
+        request_injector = self.injector.scope(REQUEST_SCOPE)
+        request_injector.release()
+        with self.assertRaises(InjectorError):
+            request_injector.release()
+        with self.injector.scope(REQUEST_SCOPE) as reused:
+            self.assertIs(reused, request_injector)
+            reused.release()
+        self.assertIsNot(self.injector.scope(REQUEST_SCOPE), self.injector.scope(REQUEST_SCOPE))
+
+    def test_release_not_scope_container(self):
+        with self.assertRaises(InjectorError):
+            self.injector.child().release()
+
+    def test_no_active_scope(self):
+        with self.assertRaises(InjectorError):
+            self.injector.get('session')
+
+    def test_application_scope(self):
+        calls = []
+        self.injector.register_scoped('client', lambda database: calls.append(database) or sentinel.client, APPLICATION_SCOPE)
+        self.assertEqual(calls, [])
+        with self.injector.scope(REQUEST_SCOPE, request=sentinel.request) as request_injector:
+            self.assertIs(request_injector.get('client'), sentinel.client)
+        self.assertIs(self.injector.get('client'), sentinel.client)
+        self.assertEqual(calls, [sentinel.database])
+
+    def test_task_scope(self):
+        self.injector.register_scoped('task_state', lambda session, task: [session, task], TASK_SCOPE)
+        with self.injector.scope(REQUEST_SCOPE, request=sentinel.request) as request_injector:
+            with request_injector.scope(TASK_SCOPE, task=sentinel.task1) as task_injector:
+                task_state1 = task_injector.get('task_state')
+            with request_injector.scope(TASK_SCOPE, task=sentinel.task2) as task_injector:
+                task_state2 = task_injector.get('task_state')
+        self.assertIs(task_state1[0], task_state2[0])
+        self.assertEqual([task_state1[1], task_state2[1]], [sentinel.task1, sentinel.task2])
+
+
+class BindTests(unittest.TestCase):
+
+    def test_bind(self):
+        injector = Injector(data={'x': sentinel.x}).child(y=sentinel.y)
+        bound = injector.bind(lambda x, y, z=sentinel.default: [x, y, z])
+        self.assertEqual(bound(), [sentinel.x, sentinel.y, sentinel.default])
+        self.assertEqual(bound(z=sentinel.z), [sentinel.x, sentinel.y, sentinel.z])
+        self.assertEqual(bound(x=sentinel.other_x), [sentinel.other_x, sentinel.y, sentinel.default])
+
+    def test_resolved_once(self):
+        parent = Injector(data={'x': sentinel.x})
+        injector = parent.child()
+        with patch.object(Injector, '_lookup', autospec=True, side_effect=Injector._lookup) as lookup:
+            bound = injector.bind(lambda x: x)
+            lookup.assert_called_once_with(injector, 'x')
+            for i in range(3):
+                self.assertIs(bound(), sentinel.x)
+            self.assertEqual(lookup.call_count, 1)
+
+    def test_missing(self):
+        bound = Injector().bind(lambda x: x)
+        with self.assertRaises(InjectorError):
+            bound()
+        self.assertIs(bound(x=sentinel.x), sentinel.x)
+
+    def test_registered_later_in_parent(self):
+        parent = Injector()
+        injector = parent.child()
+        bound = injector.bind(lambda x, y=sentinel.default: [x, y])
+        parent.register('x', sentinel.x)
+        self.assertEqual(bound(), [sentinel.x, sentinel.default])
+        parent.register('y', sentinel.y)
+        self.assertEqual(bound(), [sentinel.x, sentinel.y])
+
+    def test_registered_later_in_bound_injector(self):
+        injector = Injector()
+        bound = injector.bind(lambda x: x)
+        injector.register('x', sentinel.x)
+        self.assertIs(bound(), sentinel.x)
+
+    def test_scoped(self):
+        injector = Injector()
+        injector.register_scoped('session', lambda request: [request], REQUEST_SCOPE)
+        with injector.scope(REQUEST_SCOPE, request=sentinel.request1) as request_injector:
+            bound = request_injector.bind(lambda session: session)
+            self.assertEqual(bound(), [sentinel.request1])
+        with injector.scope(REQUEST_SCOPE, request=sentinel.request2) as request_injector:
+            self.assertEqual(bound(), [sentinel.request2])
+
+
+    def test_not_resolved_again_for_descendant_changes(self):
+        root = Injector(data={'x': sentinel.x})
+        bound = root.bind(lambda x: x)
+        with patch.object(Injector, '_lookup', autospec=True, side_effect=Injector._lookup) as lookup:
+            for i in range(10):
+                with root.scope(REQUEST_SCOPE, request=i) as request_injector:
+                    request_injector.child(handler=i).bind(lambda request, handler: None)()
+                    request_injector.register('late', i)
+                    self.assertIs(bound(), sentinel.x)
+            self.assertEqual([call[0][0] for call in lookup.call_args_list if call[0][0] is root], [])
+
+    def test_concurrent_bind_and_register(self):
+        root = Injector()
+        child = root.child()
+        def bind(i):
+            return [child.child().bind(lambda late=None: late) for j in range(200)]
+        with ThreadPoolExecutor(4) as executor:
+            futures = [executor.submit(bind, i) for i in range(4)]
+            for i in range(200):
+                root.register('x{}'.format(i), i)
+            bound = [f for future in futures for f in future.result()]
+        root.register('late', sentinel.late)
+        self.assertTrue(all(f() is sentinel.late for f in bound))
+
+
+class FlattenedInjectorTests(unittest.TestCase):
+
+    def _create_chain(self, depth):
+        injector = Injector(data={'root': sentinel.root, 'shadowed': sentinel.root_shadowed}, flatten=True)
+        chain = [injector]
+        for i in range(depth):
+            injector = injector.child(**{'level{}'.format(i): i})
+            chain.append(injector)
+        return chain
+
+    def test_lookup(self):
+        chain = self._create_chain(5)
+        chain[2].register('shadowed', sentinel.shadowed)
+        deepest = chain[-1]
+        self.assertTrue(deepest._flatten)
+        self.assertIs(deepest.get('root'), sentinel.root)
+        self.assertIs(deepest.get('shadowed'), sentinel.shadowed)
+        self.assertIs(chain[1].get('shadowed'), sentinel.root_shadowed)
+        self.assertEqual(deepest.get('level0'), 0)
+        with self.assertRaises(InjectorError):
+            deepest.get('missing')
+
+    def test_ancestors_not_walked(self):
+        chain = self._create_chain(5)
+        deepest = chain[-1]
+        deepest.get('root')
+        lookup = Injector._lookup
+        def only_deepest(injector, interface):
+            if injector is not deepest:
+                raise AssertionError('ancestors should not be walked')
+            return lookup(injector, interface)
+        with patch.object(Injector, '_lookup', autospec=True, side_effect=only_deepest):
+            self.assertIs(deepest.get('root'), sentinel.root)
+            self.assertEqual(deepest.get('level1'), 1)
+
+    def test_view_shared_by_children(self):
+        chain = self._create_chain(2)
+        self.assertIs(chain[2].child()._parent._get_view(), chain[2].child()._parent._get_view())
+
+    def test_parent_registers_later(self):
+        chain = self._create_chain(4)
+        deepest = chain[-1]
+        with self.assertRaises(InjectorError):
+            deepest.get('late')
+        chain[1].register('late', sentinel.late)
+        self.assertIs(deepest.get('late'), sentinel.late)
+        chain[0].register('later', sentinel.later)
+        self.assertIs(deepest.get('later'), sentinel.later)
+
+    def test_view_kept_for_sibling_changes(self):
+        chain = self._create_chain(2)
+        view = chain[2].child()._parent._get_view()
+        sibling = chain[1].child()
+        sibling.child().get('root')
+        sibling.register('other', sentinel.other)
+        self.assertIs(chain[2]._get_view(), view)
+        chain[1].register('other', sentinel.other)
+        self.assertIsNot(chain[2]._get_view(), view)
+        self.assertIs(chain[2].child().get('other'), sentinel.other)
+
+    def test_view_not_copied_from_parent(self):
+        chain = self._create_chain(30)
+        self.assertIs(chain[3]._get_view().base, chain[0]._get_view())
+        self.assertIs(chain[3].child()._get_view(), chain[3]._get_view())
+        self.assertTrue(all(len(getattr(injector._get_view(), 'layers', ())) <= 8 for injector in chain))
+        deepest = chain[-1].child()
+        for i in range(30):
+            self.assertEqual(deepest.get('level{}'.format(i)), i)
+        self.assertIs(deepest.get('root'), sentinel.root)
+
+    def test_duplicates_rejected(self):
+        chain = self._create_chain(2)
+        with self.assertRaises(InjectorError):
+            chain[2].register('level1', 2)
+        chain[2].register('level0', sentinel.overriden)
+        self.assertIs(chain[2].child().get('level0'), sentinel.overriden)
+
+    def test_mode_inherited(self):
+        self.assertTrue(Injector(flatten=True).child()._flatten)
+        self.assertFalse(Injector().child()._flatten)
+        self.assertFalse(Injector(Injector(flatten=True), flatten=False)._flatten)
+
+
+class CompactStorageTests(unittest.TestCase):
+
+    def test_empty_bindings_shared(self):
+        root = Injector()
+        self.assertIs(root.child()._data, root.child()._data)
+
+    def test_concurrent_registers_not_lost(self):
+        for attempt in range(20):
+            injector = Injector()
+            barrier = threading.Barrier(8)
+            def register(i):
+                barrier.wait()
+                injector.register('i{}'.format(i), i)
+            with ThreadPoolExecutor(8) as executor:
+                list(executor.map(register, range(8)))
+            self.assertEqual(dict((i, injector.get('i{}'.format(i))) for i in range(8)), dict((i, i) for i in range(8)))
+
+    def test_converted_to_dict(self):
+        injector = Injector()
+        for i in range(10):
+            injector.register('i{}'.format(i), i)
+            self.assertEqual(isinstance(injector._data, dict), i >= 4)
+        for i in range(10):
+            self.assertEqual(injector.get('i{}'.format(i)), i)
+        self.assertEqual(isinstance(Injector(data=dict(('i{}'.format(i), i) for i in range(10)))._data, dict), True)
+
+    def test_keys_shared(self):
+        root = Injector()
+        self.assertIs(root.child(context=1)._data[0], root.child(context=2)._data[0])
+
+    def test_duplicate_in_small_storage(self):
+        injector = Injector().child(x=sentinel.x)
+        with self.assertRaises(InjectorError):
+            injector.register('x', sentinel.other_x)
+
+    def test_no_instance_dict(self):
+        with self.assertRaises(AttributeError):
+            Injector().some_attribute = sentinel.value
+
+
+class CurrentInjectorTests(unittest.TestCase):
+
+    def test_activate(self):
+        injector = Injector(data={'x': sentinel.x})
+        with self.assertRaises(InjectorError):
+            Injector.current()
+        with injector.activate() as active:
+            self.assertIs(active, injector)
+            self.assertIs(Injector.current(), injector)
+            self.assertIs(Injector.call_current(lambda x: x), sentinel.x)
+        with self.assertRaises(InjectorError):
+            Injector.current()
+
+    def test_nested(self):
+        injector = Injector(data={'x': sentinel.x})
+        with injector.activate():
+            with Injector.current().activate_child(x=sentinel.child_x) as child:
+                self.assertIs(child._parent, injector)
+                self.assertIs(Injector.call_current(lambda x: x), sentinel.child_x)
+            self.assertIs(Injector.current(), injector)
+
+    def test_scope_released(self):
+        injector = Injector()
+        injector.register_scoped('x', Mock(side_effect=lambda: object()))
+        with injector.activate_child(REQUEST_SCOPE, request=sentinel.request) as container:
+            self.assertIs(Injector.current().get('request'), sentinel.request)
+            self.assertIs(Injector.current().get('x'), container.get('x'))
+        with injector.activate_child(REQUEST_SCOPE) as reused:
+            self.assertIs(reused, container)
+            with self.assertRaises(InjectorError):
+                Injector.current().get('request')
+
+    def test_threads(self):
+        injector = Injector()
+        results = {}
+        def handle(i):
+            with injector.activate_child(request=i):
+                barrier.wait()
+                results[i] = Injector.call_current(lambda request: request)
+        barrier = threading.Barrier(4)
+        threads = [threading.Thread(target=handle, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {0: 0, 1: 1, 2: 2, 3: 3})
+
+    def test_tasks(self):
+        injector = Injector()
+        async def handle(i):
+            with injector.activate_child(request=i):
+                await asyncio.sleep(0)
+                return Injector.call_current(lambda request: request)
+        async def main():
+            with injector.activate():
+                return await asyncio.gather(*[handle(i) for i in range(4)])
+        self.assertEqual(asyncio.run(main()), [0, 1, 2, 3])
+
+
+class ProvidersTests(unittest.TestCase):
+
+    def setUp(self):
+        self.injector = Injector(data={'database': sentinel.database})
+        self.calls = []
+
+    def _provider(self, database):
+        self.calls.append(database)
+        return object()
+
+    def test_singleton_by_default(self):
+        self.injector.register_provider('client', self._provider)
+        self.assertEqual(self.calls, [])
+        child = self.injector.child(database=sentinel.other_database)
+        self.assertIs(child.get('client'), self.injector.get('client'))
+        self.assertEqual(self.calls, [sentinel.database])
+        self.assertEqual(self.injector.get_provider_stats('client'), {'hits': 1, 'misses': 1, 'evictions': 0})
+
+    def test_per_thread(self):
+        self.injector.register_provider('client', self._provider, PerThread())
+        instances = []
+        def get():
+            instances.append(self.injector.get('client'))
+            instances.append(self.injector.get('client'))
+        thread = threading.Thread(target=get)
+        thread.start()
+        thread.join()
+        get()
+        self.assertIs(instances[0], instances[1])
+        self.assertIs(instances[2], instances[3])
+        self.assertIsNot(instances[0], instances[2])
+        self.assertEqual(self.injector.get_provider_stats('client'), {'hits': 2, 'misses': 2, 'evictions': 0})
+
+    def test_per_scope(self):
+        self.injector.register_provider('client', self._provider, PerScope(REQUEST_SCOPE))
+        with self.injector.scope(REQUEST_SCOPE, database=sentinel.request_database) as request:
+            self.assertIs(request.get('client'), request.get('client'))
+        self.assertEqual(self.calls, [sentinel.request_database])
+
+    def test_per_scope_threads_share_container(self):
+        def provider():
+            self.calls.append(None)
+            time.sleep(0.01)
+            return object()
+        self.injector.register_provider('client', provider, PerScope(REQUEST_SCOPE))
+        barrier = threading.Barrier(8)
+        with self.injector.scope(REQUEST_SCOPE) as request:
+            def get():
+                barrier.wait()
+                return request.get('client')
+            with ThreadPoolExecutor(8) as executor:
+                instances = list(executor.map(lambda i: get(), range(8)))
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(all(instance is instances[0] for instance in instances))
+
+    def test_cached_concurrent_misses_create_once(self):
+        def provider():
+            self.calls.append(None)
+            time.sleep(0.01)
+            return object()
+        self.injector.register_provider('client', provider, Cached())
+        barrier = threading.Barrier(8)
+        def get(i):
+            barrier.wait()
+            return self.injector.get('client')
+        with ThreadPoolExecutor(8) as executor:
+            instances = list(executor.map(get, range(8)))
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(all(instance is instances[0] for instance in instances))
+        self.assertEqual(self.injector.get_provider_stats('client'), {'hits': 7, 'misses': 1, 'evictions': 0})
+
+    def test_cached_failed_creation_not_kept(self):
+        provider = Mock(side_effect=[ValueError(), sentinel.client])
+        self.injector.register_provider('client', lambda: provider(), Cached())
+        with self.assertRaises(ValueError):
+            self.injector.get('client')
+        self.assertIs(self.injector.get('client'), sentinel.client)
+
+    def test_counters_thread_safe(self):
+        self.injector.register_provider('client', self._provider, PerThread())
+        def get(i):
+            for j in range(1000):
+                self.injector.get('client')
+        with ThreadPoolExecutor(4) as executor:
+            list(executor.map(get, range(4)))
+        stats = self.injector.get_provider_stats('client')
+        self.assertEqual(stats['hits'] + stats['misses'], 4000)
+
+    def test_cached_lru(self):
+        self.injector.register_provider('client', lambda tenant: [tenant], Cached(maxsize=2, key=lambda tenant: tenant))
+        def get(tenant):
+            return self.injector.child(tenant=tenant).get('client')
+        a = get('a')
+        self.assertEqual(a, ['a'])
+        self.assertIs(get('a'), a)
+        get('b')
+        get('a')
+        get('c')
+        self.assertIs(get('a'), a)
+        self.assertEqual(self.injector.get_provider_stats('client'), {'hits': 3, 'misses': 3, 'evictions': 1})
+        self.assertEqual(get('b'), ['b'])
+
+    @patch('modulr.injections.time')
+    def test_cached_ttl(self, time):
+        time.monotonic.return_value = 100.0
+        self.injector.register_provider('client', self._provider, Cached(ttl=10))
+        client = self.injector.get('client')
+        time.monotonic.return_value = 109.0
+        self.assertIs(self.injector.get('client'), client)
+        time.monotonic.return_value = 111.0
+        self.assertIsNot(self.injector.get('client'), client)
+        self.assertEqual(self.injector.get_provider_stats('client'), {'hits': 1, 'misses': 2, 'evictions': 1})
+
+    def test_policy_not_shared(self):
+        policy = Singleton()
+        self.injector.register_provider('a', self._provider, policy)
+        with self.assertRaises(InjectorError):
+            self.injector.register_provider('b', self._provider, policy)
+
+    def test_stats_of_not_provider(self):
+        with self.assertRaises(InjectorError):
+            self.injector.get_provider_stats('database')
+
+    def test_bound_call(self):
+        self.injector.register_provider('client', self._provider, Cached(ttl=0))
+        bound = self.injector.bind(lambda client: client)
+        self.assertIsNot(bound(), bound())
+
+
+class StatsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root = Injector(data={'x': sentinel.x})
+        self.injector = self.root.child().child(y=sentinel.y)
+
+    def test_disabled(self):
+        self.assertIsNone(self.injector.get_stats())
+        self.injector.get('x')
+        stats = self.injector.enable_stats()
+        self.assertIs(self.root.get_stats(), stats)
+        self.assertEqual(stats.snapshot()['lookups'], {})
+        self.injector.disable_stats()
+        self.assertIsNone(self.root.get_stats())
+
+    def test_lookups(self):
+        stats = self.root.enable_stats()
+        self.injector.get('x')
+        self.injector.get('y')
+        with self.assertRaises(InjectorError):
+            self.injector.get('z')
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['lookups'], {'x': 1, 'y': 1, 'z': 1})
+        self.assertEqual(snapshot['misses'], {'z': 1})
+        self.assertEqual(snapshot['average_depth'], (2 + 0 + 2) / 3.0)
+
+    def test_flattened_depth(self):
+        injector = Injector(data={'x': sentinel.x}, flatten=True).child().child()
+        stats = injector.enable_stats()
+        self.assertIs(injector.get('x'), sentinel.x)
+        self.assertEqual(stats.get_average_depth(), 1.0)
+
+    @patch('modulr.injections.time')
+    def test_call(self, time):
+        time.perf_counter.side_effect = [1.0, 1.5, 4.0]
+        stats = self.injector.enable_stats()
+        self.assertEqual(self.injector.call(lambda x, y: [x, y]), [sentinel.x, sentinel.y])
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['calls'], 1)
+        self.assertEqual(snapshot['resolve_time'], 0.5)
+        self.assertEqual(snapshot['call_time'], 2.5)
+        self.assertEqual(snapshot['lookups'], {'x': 1, 'y': 1})
+
+    def test_export_json(self):
+        stats = self.injector.enable_stats()
+        self.injector.get('x')
+        output = io.StringIO()
+        stats.export_json(output)
+        self.assertEqual(json.loads(output.getvalue())['lookups'], {'x': 1})
+        stats.reset()
+        self.assertEqual(stats.snapshot()['lookups'], {})
+
+
+class CallManyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.injector = Injector(data={'x': sentinel.x, 'y': sentinel.y})
+
+    def _test(self, executor=None):
+        error = ValueError()
+        def fail(x):
+            raise error
+        results = self.injector.call_many([
+            lambda x: x,
+            lambda y, event: [y, event],
+            fail,
+            lambda missing: None,
+            lambda missing=sentinel.default: missing,
+        ], executor, event=sentinel.event)
+        self.assertIs(results[0], sentinel.x)
+        self.assertEqual(results[1], [sentinel.y, sentinel.event])
+        self.assertIs(results[2], error)
+        self.assertIsInstance(results[3], InjectorError)
+        self.assertIs(results[4], sentinel.default)
+
+    def test_serial(self):
+        self._test()
+
+    def test_executor(self):
+        with ThreadPoolExecutor(2) as executor:
+            self._test(executor)
+
+    def test_resolved_once(self):
+        with patch.object(Injector, '_find', autospec=True, side_effect=Injector._find) as find:
+            self.injector.call_many([lambda x: x] * 10 + [lambda x, y: y] * 10)
+        self.assertEqual(sorted(call[0][1] for call in find.call_args_list), ['x', 'y'])
+
+    def test_resolution_error(self):
+        self.injector.register_scoped('session', lambda: sentinel.session, REQUEST_SCOPE)
+        results = self.injector.call_many([lambda session: session, lambda x: x])
+        self.assertIsInstance(results[0], InjectorError)
+        self.assertIs(results[1], sentinel.x)
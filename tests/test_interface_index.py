@@ -0,0 +1,31 @@
+import unittest
+from modulr.interface_index import InterfaceIndex
+
+
+class InterfaceIndexTest(unittest.TestCase):
+
+    def test_empty(self):
+        index = InterfaceIndex()
+        self.assertListEqual(index.get_providers('interface'), [])
+        self.assertIsNone(index.get_unique_provider('interface'))
+        self.assertFalse(index.has_provider('interface', 'a'))
+
+    def test_unique_provider(self):
+        index = InterfaceIndex()
+        index.add('interface', 'a')
+        self.assertEqual(index.get_unique_provider('interface'), 'a')
+        index.add('interface', 'b')
+        self.assertIsNone(index.get_unique_provider('interface'))
+        self.assertListEqual(index.get_providers('interface'), ['a', 'b'])
+        index.remove('interface', 'a')
+        self.assertEqual(index.get_unique_provider('interface'), 'b')
+        index.remove('interface', 'b')
+        self.assertIsNone(index.get_unique_provider('interface'))
+        self.assertListEqual(index.get_providers('interface'), [])
+
+    def test_has_provider(self):
+        index = InterfaceIndex()
+        index.add('interface', 'a')
+        index.add('other_interface', 'b')
+        self.assertTrue(index.has_provider('interface', 'a'))
+        self.assertFalse(index.has_provider('interface', 'b'))
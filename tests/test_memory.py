@@ -0,0 +1,71 @@
+import gc
+import tracemalloc
+import unittest
+from modulr.application import ComponentContext, Constraints
+from modulr.injections import Injector
+
+
+class BaselineInjector(object):
+    """ Layout of `Injector` before `__slots__` and small bindings: instance `__dict__` and a dict of bindings. """
+
+    def __init__(self, parent=None):
+        self._parent = parent
+        self._data = {}
+
+    def child(self, **kwargs):
+        ret = BaselineInjector(self)
+        for interface, implementation in kwargs.items():
+            ret._data[interface] = implementation
+        return ret
+
+
+class BaselineComponentContext(object):
+
+    def __init__(self, name, config, scripts_manager):
+        self.name = name
+        self.config = config
+        self.scripts_manager = scripts_manager
+
+
+def measure(create, count=2000):
+    """ Returns memory allocated per instance created by `create`. """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        instances = [create() for i in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del instances
+    return float(after - before) / count
+
+
+class MemoryTest(unittest.TestCase):
+    """ Per-instance memory compared with the baseline layout. """
+
+    def _assert_saved(self, create, create_baseline, ratio):
+        self.assertLess(measure(create), measure(create_baseline) * ratio)
+
+    def test_injector_child(self):
+        root = Injector()
+        baseline_root = BaselineInjector()
+        self._assert_saved(root.child, baseline_root.child, 0.8)
+
+    def test_injector_child_with_context(self):
+        root = Injector()
+        baseline_root = BaselineInjector()
+        context = ComponentContext('name', None, None)
+        self._assert_saved(lambda: root.child(context=context), lambda: baseline_root.child(context=context), 0.7)
+
+    def test_injector_child_with_bindings(self):
+        root = Injector()
+        baseline_root = BaselineInjector()
+        self._assert_saved(lambda: root.child(a=1, b=2), lambda: baseline_root.child(a=1, b=2), 0.7)
+
+    def test_component_context(self):
+        self._assert_saved(lambda: ComponentContext('name', None, None), lambda: BaselineComponentContext('name', None, None), 0.8)
+
+    def test_no_instance_dict(self):
+        for instance in [Injector(), ComponentContext('name', None, None), Constraints([], [])]:
+            self.assertFalse(hasattr(instance, '__dict__'))
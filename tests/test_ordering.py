@@ -0,0 +1,105 @@
+import random
+import unittest
+from modulr.ordering import DynamicTopologicalOrder
+
+
+class DynamicTopologicalOrderTest(unittest.TestCase):
+
+    def _assert_valid(self, order, edges):
+        positions = dict((node, index) for index, node in enumerate(order.get_order()))
+        for a, b in edges:
+            self.assertLess(positions[a], positions[b])
+
+    def test_reorder(self):
+        order = DynamicTopologicalOrder()
+        for node in 'abcd':
+            order.add_node(node)
+        self.assertTrue(order.add_edge('d', 'c'))
+        self.assertTrue(order.add_edge('c', 'b'))
+        self.assertTrue(order.add_edge('b', 'a'))
+        self.assertListEqual(order.get_order(), ['d', 'c', 'b', 'a'])
+        self.assertListEqual(order.get_levels(), [('d',), ('c',), ('b',), ('a',)])
+
+    def test_cycle_blocked_until_removed(self):
+        order = DynamicTopologicalOrder()
+        for node in 'abc':
+            order.add_node(node)
+        self.assertTrue(order.add_edge('a', 'b'))
+        self.assertTrue(order.add_edge('b', 'c'))
+        self.assertFalse(order.add_edge('c', 'a'))
+        self.assertListEqual(order.get_blocked_edges(), [('c', 'a')])
+        order.remove_edge('a', 'b')
+        self.assertListEqual(order.get_blocked_edges(), [])
+        self._assert_valid(order, [('b', 'c'), ('c', 'a')])
+
+    def test_self_loop(self):
+        order = DynamicTopologicalOrder()
+        order.add_node('a')
+        self.assertFalse(order.add_edge('a', 'a'))
+        order.remove_node('a')
+        self.assertListEqual(order.get_blocked_edges(), [])
+
+    def test_remove_node_unblocks(self):
+        order = DynamicTopologicalOrder()
+        for node in 'abc':
+            order.add_node(node)
+        order.add_edge('a', 'b')
+        order.add_edge('b', 'c')
+        order.add_edge('c', 'a')
+        order.remove_node('b')
+        self.assertListEqual(order.get_blocked_edges(), [])
+        self._assert_valid(order, [('c', 'a')])
+
+    def test_random_dags(self):
+        generator = random.Random(0)
+        for i in range(20):
+            order = DynamicTopologicalOrder()
+            nodes = list(range(30))
+            generator.shuffle(nodes)
+            for node in nodes:
+                order.add_node(node)
+            edges = set()
+            for j in range(60):
+                a, b = sorted(generator.sample(range(30), 2))
+                self.assertTrue(order.add_edge(a, b))
+                edges.add((a, b))
+            self._assert_valid(order, edges)
+            for edge in generator.sample(sorted(edges), 20):
+                order.remove_edge(*edge)
+                edges.discard(edge)
+            self._assert_valid(order, edges)
+
+    def _assert_levels(self, order, nodes, edges):
+        expected = {}
+        for node in order.get_order():
+            expected[node] = max([expected[a] + 1 for a, b in edges if b == node] or [0])
+        levels = order.get_levels()
+        self.assertEqual(sorted(node for level in levels for node in level), sorted(nodes))
+        for index, level in enumerate(levels):
+            for node in level:
+                self.assertEqual(index, expected[node])
+
+    def test_levels_kept_up_to_date(self):
+        generator = random.Random(1)
+        for i in range(10):
+            order = DynamicTopologicalOrder()
+            nodes = set(range(20))
+            for node in nodes:
+                order.add_node(node)
+            edges = set()
+            for j in range(100):
+                action = generator.random()
+                if action < 0.6:
+                    a, b = sorted(generator.sample(sorted(nodes), 2))
+                    if order.add_edge(a, b):
+                        edges.add((a, b))
+                elif (action < 0.9 or len(nodes) < 3) and edges:
+                    edge = generator.choice(sorted(edges))
+                    order.remove_edge(*edge)
+                    edges.discard(edge)
+                elif len(nodes) > 2:
+                    node = generator.choice(sorted(nodes))
+                    order.remove_node(node)
+                    nodes.discard(node)
+                    edges = set(edge for edge in edges if node not in edge)
+                self._assert_levels(order, nodes, edges)
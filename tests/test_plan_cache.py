@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+from mock import sentinel, Mock
+from modulr.application import ComponentFactoryRegistry, Application, simple_component_factory, ConfiguredComponentFactory
+from modulr.plan_cache import StartupPlanCache
+
+
+def dependant_component():
+    return Mock()
+
+
+def depending_component(dependant):
+    return Mock()
+
+
+def create_registry(requirements_mapping=None):
+    cfr = ComponentFactoryRegistry()
+    cfr.register(ConfiguredComponentFactory('dependant_component_name', simple_component_factory(dependant_component, ['dependant']), sentinel.config))
+    cfr.register(ConfiguredComponentFactory('other_dependant_component_name', simple_component_factory(dependant_component, ['other_dependant']), sentinel.config))
+    cfr.register(ConfiguredComponentFactory('depending_component_name', simple_component_factory(depending_component, ['depending']), sentinel.config, requirements_mapping))
+    return cfr
+
+
+class StartupPlanCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = StartupPlanCache(os.path.join(self.directory, 'plans'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load_missing(self):
+        self.assertIsNone(self.cache.load('fingerprint'))
+
+    def test_store_and_load(self):
+        self.cache.store('fingerprint', {'levels': [['a']]})
+        self.assertEqual(self.cache.load('fingerprint'), {'levels': [['a']]})
+
+    def test_corrupted(self):
+        self.cache.store('fingerprint', {})
+        with open(self.cache._get_path('fingerprint'), 'w') as f:
+            f.write('{')
+        self.assertIsNone(self.cache.load('fingerprint'))
+
+    def test_warm_compile_skips_resolution(self):
+        plan = create_registry().compile(self.cache)
+        cfr = create_registry()
+        cfr.resolve = Mock(side_effect=AssertionError('should not be resolved'))
+        cached_plan = cfr.compile(self.cache)
+        self.assertEqual(cached_plan.get_levels(), plan.get_levels())
+        self.assertEqual(cached_plan.to_data(), plan.to_data())
+        app = Application({}, cfr)
+        app.start(plan=cached_plan)
+        self.assertEqual(len(app._components), 3)
+
+    def test_structurally_corrupted_entry_compiled_again(self):
+        cfr = create_registry()
+        fingerprint = cfr.get_fingerprint()
+        plan = create_registry().compile()
+        for data in [{}, [], {'injections': [], 'levels': 1, 'lazy': [], 'fork_safe': []}, 
+                dict(plan.to_data(), levels=[['dependant_component_name']]), 
+                dict(plan.to_data(), injections={'depending_component_name': {'dependant': 'missing'}})]:
+            self.cache.store(fingerprint, data)
+            cfr = create_registry()
+            self.assertEqual(cfr.compile(self.cache).to_data(), plan.to_data())
+            self.assertEqual(self.cache.load(fingerprint), plan.to_data())
+
+    def test_fingerprint_changes_with_constraints(self):
+        fingerprint = create_registry().get_fingerprint()
+        self.assertEqual(fingerprint, create_registry().get_fingerprint())
+        self.assertNotEqual(fingerprint, create_registry({'dependant': 'dependant_component_name'}).get_fingerprint())
+        cfr = create_registry()
+        cfr.register(ConfiguredComponentFactory('another_component_name', simple_component_factory(dependant_component, ['another']), sentinel.config))
+        self.assertNotEqual(fingerprint, cfr.get_fingerprint())
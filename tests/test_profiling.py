@@ -0,0 +1,76 @@
+import json
+import unittest
+from mock import sentinel, Mock, patch
+from modulr.application import ComponentFactoryRegistry, Application, simple_component_factory, ConfiguredComponentFactory,\
+    WrongConfigurationError
+from modulr.profiling import StartupProfiler
+
+
+def create_registry():
+    def a():
+        return Mock()
+    def b(a_interface):
+        return Mock()
+    def c(a_interface):
+        return Mock()
+    def d(b_interface, c_interface):
+        return Mock()
+    cfr = ComponentFactoryRegistry()
+    for name, function in [('a', a), ('b', b), ('c', c), ('d', d)]:
+        cfr.register(ConfiguredComponentFactory(name, simple_component_factory(function, [name + '_interface']), sentinel.config))
+    return cfr
+
+
+class StartupProfilerTest(unittest.TestCase):
+
+    def test_measure(self):
+        profiler = StartupProfiler()
+        function = Mock(return_value=sentinel.output)
+        self.assertEqual(sentinel.output, profiler.measure(StartupProfiler.CREATE, 'a', function, sentinel.arg))
+        function.assert_called_once_with(sentinel.arg)
+        self.assertGreaterEqual(profiler._timings['a'].create_wall_time, 0.0)
+
+    def test_critical_path(self):
+        profiler = StartupProfiler()
+        profiler._record(StartupProfiler.CREATE, 'a', 1.0, 1.0)
+        profiler._record(StartupProfiler.CREATE, 'b', 1.0, 0.5)
+        profiler._record(StartupProfiler.CREATE, 'c', 3.0, 0.5)
+        profiler._record(StartupProfiler.INIT, 'c', 1.0, 0.5)
+        profiler._record(StartupProfiler.CREATE, 'd', 1.0, 0.5)
+        report = profiler.get_report(create_registry().compile())
+        self.assertListEqual(report.critical_path, ['a', 'c', 'd'])
+        self.assertEqual(report.critical_path_time, 6.0)
+        self.assertEqual(report.get_total_wall_time(), 7.0)
+        self.assertListEqual([timing['name'] for timing in report.to_dict()['components']], ['a', 'b', 'c', 'd'])
+
+
+class ApplicationProfilingTest(unittest.TestCase):
+
+    def test_report_and_script(self):
+        app = Application({}, create_registry(), profiler=StartupProfiler())
+        app.start()
+        report = app.get_startup_report()
+        self.assertListEqual([timing.name for timing in report.timings], ['a', 'b', 'c', 'd'])
+        self.assertEqual(report.critical_path[0], 'a')
+        self.assertEqual(report.critical_path[-1], 'd')
+        with patch('sys.stdout') as stdout:
+            output = app.get_scripts_manager().run_script_from_args(['startup-profile', '--json'])
+        self.assertEqual(json.loads(stdout.write.call_args[0][0])['critical_path'], output.critical_path)
+
+    def test_no_profiler(self):
+        app = Application({}, create_registry())
+        app.start()
+        with self.assertRaises(ValueError):
+            app.get_scripts_manager().run_script_from_args(['startup-profile'])
+
+    def test_report_without_profiler(self):
+        app = Application({}, ComponentFactoryRegistry())
+        with self.assertRaises(WrongConfigurationError):
+            app.get_startup_report()
+
+    def test_report_before_start(self):
+        app = Application({}, create_registry(), profiler=StartupProfiler())
+        report = app.get_startup_report()
+        self.assertListEqual(report.timings, [])
+        self.assertListEqual(report.critical_path, [])
+        self.assertEqual(report.critical_path_time, 0.0)
@@ -28,3 +28,29 @@ class ScriptsManagerTest(unittest.TestCase):
         output = sm.run_script_from_args(['script_name', sentinel.arg1, sentinel.arg2])
         self.assertEquals(output, sentinel.output)
         script.assert_called_once_with([sentinel.arg1, sentinel.arg2])
+
+    def test_requires_string_rejected(self):
+        sm = ScriptsManager()
+        with self.assertRaises(ValueError):
+            sm.register('script_name', Mock(), requires='database')
+        with self.assertRaises(ValueError):
+            sm.get_script_info('script_name')
+
+    def test_lazy_import(self):
+        sm = ScriptsManager()
+        sm.register('dump', 'json:dumps', help='Dumps arguments', requires=['config'])
+        info = sm.get_script_info('dump')
+        self.assertEquals(info.help, 'Dumps arguments')
+        self.assertEquals(info.requires, ['config'])
+        self.assertFalse(info.is_loaded())
+        self.assertEquals(sm.run_script_from_args(['dump', 'a', 'b']), '["a", "b"]')
+        self.assertTrue(info.is_loaded())
+
+    def test_not_imported_until_run(self):
+        sm = ScriptsManager()
+        sm.register('broken', 'no_such_module_for_modulr:script')
+        sm.register('simple', Mock(return_value=sentinel.output))
+        self.assertEquals([info.name for info in sm.list_scripts()], ['broken', 'simple'])
+        self.assertEquals(sm.run_script_from_args(['simple']), sentinel.output)
+        with self.assertRaises(ImportError):
+            sm.run_script_from_args(['broken'])
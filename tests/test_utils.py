@@ -0,0 +1,21 @@
+import os.path
+import unittest
+from modulr.utils import import_by_path
+
+
+class ImportByPathTest(unittest.TestCase):
+
+    def test_colon(self):
+        self.assertIs(import_by_path('os.path:join'), os.path.join)
+
+    def test_dotted(self):
+        self.assertIs(import_by_path('os.path.join'), os.path.join)
+
+    def test_nested_attribute(self):
+        self.assertIs(import_by_path('modulr.utils:import_by_path.__call__').__self__, import_by_path)
+
+    def test_missing(self):
+        with self.assertRaises(ImportError):
+            import_by_path('no_such_module_for_modulr:function')
+        with self.assertRaises(AttributeError):
+            import_by_path('os.path:no_such_function')
@@ -0,0 +1,70 @@
+import unittest
+from mock import sentinel, Mock
+from modulr.application import ComponentFactoryRegistry, ComponentFactory, Constraints, ConfiguredComponentFactory
+from modulr import validation
+from modulr.validation import find_cycles
+
+
+def register(cfr, name, implements, requires, requirements_mapping=None, fork_safe=False):
+    factory = ComponentFactory(Mock(side_effect=AssertionError('should not be created')), Constraints(implements, requires))
+    cfr.register(ConfiguredComponentFactory(name, factory, sentinel.config, requirements_mapping, fork_safe=fork_safe))
+
+
+class ValidateRegistryTest(unittest.TestCase):
+
+    def test_valid(self):
+        cfr = ComponentFactoryRegistry()
+        register(cfr, 'a', ['a_interface', 'shared'], [])
+        register(cfr, 'b', ['shared'], [])
+        register(cfr, 'c', [], ['a_interface', 'shared'], {'shared': 'b'})
+        result = cfr.validate()
+        self.assertTrue(result.is_valid())
+        self.assertEqual(result.format(), '')
+
+    def test_all_problems_reported(self):
+        cfr = ComponentFactoryRegistry()
+        register(cfr, 'a', ['shared'], [])
+        register(cfr, 'b', ['shared'], [])
+        register(cfr, 'missing', [], ['nothing'])
+        register(cfr, 'ambiguous', [], ['shared'])
+        register(cfr, 'wrong_mapping', [], ['shared'], {'shared': 'cycle1'})
+        register(cfr, 'unused_mapping', [], [], {'shared': 'a'})
+        register(cfr, 'fork_safe', [], ['unsafe'], fork_safe=True)
+        register(cfr, 'unsafe', ['unsafe'], [])
+        register(cfr, 'cycle1', ['cycle1'], ['cycle2'])
+        register(cfr, 'cycle2', ['cycle2'], ['cycle1'])
+        register(cfr, 'self_cycle', ['self_cycle'], ['self_cycle'])
+        result = cfr.validate()
+        self.assertFalse(result.is_valid())
+        problems = dict((kind, result.get_problems(kind)) for kind in [validation.MISSING_PROVIDER, validation.AMBIGUOUS_PROVIDER, 
+            validation.WRONG_MAPPING, validation.UNUSED_MAPPING, validation.FORK_UNSAFE_DEPENDENCY, validation.CYCLE])
+        self.assertEqual([(problem.component, problem.interface) for problem in problems[validation.MISSING_PROVIDER]], [('missing', 'nothing')])
+        self.assertEqual([problem.candidates for problem in problems[validation.AMBIGUOUS_PROVIDER]], [['a', 'b']])
+        self.assertEqual([problem.component for problem in problems[validation.WRONG_MAPPING]], ['wrong_mapping'])
+        self.assertEqual([problem.component for problem in problems[validation.UNUSED_MAPPING]], ['unused_mapping'])
+        self.assertEqual([problem.candidates for problem in problems[validation.FORK_UNSAFE_DEPENDENCY]], [['unsafe']])
+        self.assertEqual(sorted(sorted(problem.members) for problem in problems[validation.CYCLE]), [['cycle1', 'cycle2'], ['self_cycle']])
+        self.assertEqual(len(result.problems), 7)
+        self.assertEqual(len(result.format().splitlines()), 7)
+        self.assertEqual([problem.kind for problem in result.get_warnings()], [validation.UNUSED_MAPPING])
+        self.assertEqual(len(result.get_errors()), 6)
+
+    def test_unused_mapping_is_warning(self):
+        cfr = ComponentFactoryRegistry()
+        register(cfr, 'a', ['shared'], [])
+        register(cfr, 'unused_mapping', [], [], {'shared': 'a'})
+        result = cfr.validate()
+        self.assertTrue(result.is_valid())
+        self.assertEqual([problem.component for problem in result.get_warnings()], ['unused_mapping'])
+        cfr.compile()
+
+
+class FindCyclesTest(unittest.TestCase):
+
+    def test_no_cycles(self):
+        self.assertEqual(find_cycles(['a', 'b', 'c'], {'a': [], 'b': ['a'], 'c': ['a', 'b']}), [])
+
+    def test_cycles(self):
+        dependencies = {'a': ['b'], 'b': ['c'], 'c': ['a'], 'd': ['a', 'e'], 'e': ['d'], 'f': ['f'], 'g': []}
+        cycles = find_cycles(sorted(dependencies), dependencies)
+        self.assertEqual(sorted(sorted(cycle) for cycle in cycles), [['a', 'b', 'c'], ['d', 'e'], ['f']])